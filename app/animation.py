@@ -0,0 +1,174 @@
+import threading
+import time
+from array import array
+from collections import deque
+from constants import WR_RED_LEDS, WR_GREEN_LEDS, WR_L_DISPLAY, WR_R_DISPLAY, RED_LED_COUNT, GREEN_LED_COUNT
+
+def sweep(width):
+    """All LEDs on, then switched off one at a time from the top."""
+    mask = (1 << width) - 1
+    return array('I', (mask >> i for i in range(width)))
+
+def inverse_sweep(width):
+    """All LEDs on, then switched off one at a time from the bottom."""
+    mask = (1 << width) - 1
+    return array('I', ((mask << i) & mask for i in range(width)))
+
+def blink(mask, on_frames=1, off_frames=1, times=3):
+    return array('I', ([mask] * on_frames + [0] * off_frames) * times)
+
+def score_ticker(start, end):
+    """7-segment encodings counting from start to end."""
+    # utils plays the LED tables, so it is imported here and not at the top
+    from utils import seven_segment_encoder
+    step = 1 if end >= start else -1
+    return array('I', (seven_segment_encoder(num) for num in range(start, end + step, step)))
+
+RED_SWEEP = sweep(RED_LED_COUNT)
+RED_INVERSE_SWEEP = inverse_sweep(RED_LED_COUNT)
+GREEN_SWEEP = sweep(GREEN_LED_COUNT)
+GREEN_INVERSE_SWEEP = inverse_sweep(GREEN_LED_COUNT)
+RED_BLINK = blink((1 << RED_LED_COUNT) - 1)
+GREEN_BLINK = blink((1 << GREEN_LED_COUNT) - 1)
+
+# How concurrent animations on a register combine, and what it shows when idle.
+# The displays are active-low, so lit segments combine with AND. With a
+# Scoreboard the displays go back to its value instead of the idle one.
+COMPOSITE = {
+    WR_RED_LEDS: (int.__or__, 0),
+    WR_GREEN_LEDS: (int.__or__, 0),
+    WR_L_DISPLAY: (int.__and__, 0xFFFFFFFF),
+    WR_R_DISPLAY: (int.__and__, 0xFFFFFFFF)
+}
+
+class Animation:
+    def __init__(self, register, table, start_frame, hold, loop):
+        self.register = register
+        self.table = table
+        self.start_frame = start_frame
+        self.hold = hold
+        self.loop = loop
+        self.done = threading.Event()
+
+    def value(self, frame):
+        """Table entry shown at the animator frame, or None once finished."""
+        index = (frame - self.start_frame) // self.hold
+        if self.loop:
+            return self.table[index % len(self.table)]
+        if index >= len(self.table):
+            return None
+        return self.table[index]
+
+    def cancel(self):
+        self.done.set()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+class Animator(threading.Thread):
+    """Plays precomputed frame tables on the board outputs without blocking.
+
+    Frames are clocked at fps against absolute deadlines, so a late wake-up
+    drops frames instead of stretching the animation. Every frame composites
+    the active animations of each register and hands the result to the HAL,
+    which only writes registers whose value changed. Given a Scoreboard, the
+    animator leaves the flushing to its thread and borrows the displays from it
+    only while an animation plays on them.
+    """
+
+    def __init__(self, hal, fps=100, scoreboard=None):
+        super().__init__(daemon=True)
+        self.hal = hal
+        self.scoreboard = scoreboard
+        self.period = 1 / fps
+        self.fps = fps
+        self.animations = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.frame = 0
+        self.frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+        self.jitter_ns = deque(maxlen=4096)
+
+    def play(self, register, table, step=0.1, loop=False):
+        """Start an animation advancing one table entry every step seconds."""
+        hold = max(1, round(step * self.fps))
+        with self.lock:
+            animation = Animation(register, table, self.frame + 1, hold, loop)
+            self.animations.append(animation)
+        return animation
+
+    def run(self):
+        start = time.perf_counter_ns()
+        period_ns = round(self.period * 1e9)
+        active = set()
+        while not self.stopped.is_set():
+            deadline = start + (self.frame + 1) * period_ns
+            delay = deadline - time.perf_counter_ns()
+            if delay > 0:
+                time.sleep(delay / 1e9)
+
+            now = time.perf_counter_ns()
+            late = now - deadline
+            self.jitter_ns.append(abs(late))
+            if late > period_ns // 2:
+                self.late_frames += 1
+            # Frames whose deadline already passed are skipped, not replayed
+            frame = max(self.frame + 1, (now - start) // period_ns)
+            self.dropped_frames += frame - self.frame - 1
+            self.frames += 1
+
+            active = self.composite(frame, active)
+
+    def composite(self, frame, previous):
+        values = {}
+        with self.lock:
+            # Set under the lock play() reads it with, so an animation started
+            # now begins on the next frame and never sees one before its start
+            self.frame = frame
+            for animation in self.animations:
+                value = None if animation.done.is_set() else animation.value(frame)
+                if value is None:
+                    animation.done.set()
+                    continue
+                combine, _ = COMPOSITE[animation.register]
+                current = values.get(animation.register)
+                values[animation.register] = value if current is None else combine(current, value)
+            self.animations = [animation for animation in self.animations if not animation.done.is_set()]
+
+        owned = self.scoreboard.REGISTERS if self.scoreboard else ()
+        for register in values.keys() - previous:
+            if register in owned:
+                self.scoreboard.hold(register)
+        # Registers whose last animation just ended go back to their idle value
+        for register in previous - values.keys():
+            if register in owned:
+                self.scoreboard.restore(register)
+            else:
+                self.hal.set(register, COMPOSITE[register][1])
+        for register, value in values.items():
+            self.hal.set(register, value)
+        if values or previous:
+            if self.scoreboard:
+                self.scoreboard.request_flush()
+            else:
+                self.hal.flush()
+        return set(values)
+
+    def stop(self):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+
+    def stats(self):
+        jitter = sorted(self.jitter_ns)
+        return {
+            'frames': self.frames,
+            'late_frames': self.late_frames,
+            'dropped_frames': self.dropped_frames,
+            'active': len(self.animations),
+            'jitter_ms_mean': round(sum(jitter) / len(jitter) / 1e6, 3) if jitter else None,
+            'jitter_ms_p95': round(jitter[int(len(jitter) * 0.95)] / 1e6, 3) if jitter else None,
+            'jitter_ms_max': round(jitter[-1] / 1e6, 3) if jitter else None,
+        }
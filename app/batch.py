@@ -0,0 +1,450 @@
+import numpy as np
+from projectiles import pattern_velocities
+from settings import load_settings, BOSS_POINTS_NEEDED
+
+# Game states, in GameState order
+MENU, PLAYING, GAME_OVER = 0, 1, 2
+STATES = ('MENU', 'PLAYING', 'GAME_OVER')
+
+# Input codes of BatchEnv.step(): a direction index (-1 for none) and an action
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))  # up, down, left, right
+NO_DIRECTION = -1
+ACTIONS = (None, 'START', 'BOOST')
+NO_ACTION, START, BOOST = 0, 1, 2
+
+# SplitMix64 constants
+MASK64 = (1 << 64) - 1
+GAMMA = 0x9E3779B97F4A7C15
+MIX1 = 0xBF58476D1CE4E5B9
+MIX2 = 0x94D049BB133111EB
+UNIT = 2.0 ** -53
+
+class SplitMix64:
+    """SplitMix64 generator with the part of the random.Random interface the simulation uses.
+
+    One game of a BatchEnv seeded with s draws the same numbers as
+    SplitMix64(s), so Game(..., rng=SplitMix64(s)) spawns where it does.
+    """
+
+    def __init__(self, seed):
+        self.state = seed & MASK64
+
+    def next(self):
+        self.state = z = (self.state + GAMMA) & MASK64
+        z = ((z ^ (z >> 30)) * MIX1) & MASK64
+        z = ((z ^ (z >> 27)) * MIX2) & MASK64
+        return z ^ (z >> 31)
+
+    def randrange(self, n):
+        return int((self.next() >> 11) * UNIT * n)
+
+    def choice(self, seq):
+        return seq[self.randrange(len(seq))]
+
+class BatchEnv:
+    """n_games independent headless games stepped together on NumPy arrays.
+
+    Every piece of game state is an array with the game on its first axis,
+    and each rule of Game.update() is a few array operations over the games
+    it applies to, so the Python overhead of a tick is paid once for all of
+    them: from about a thousand games on, this outruns stepping that many
+    Game objects (see benchmarks/bench_batch.py). The rules, the order of
+    the random draws and the free cell bookkeeping of board.FreeCells are
+    those of Game, so a game seeded with seed + i and built with a
+    SplitMix64 stays identical to game i (see snapshot()). Rendering-only
+    state (trail, wobble, interpolation) is left out, and a direction given
+    to a game that is not playing is dropped where Game would queue it for
+    the next round.
+    """
+
+    def __init__(self, n_games, seed=0, settings=None):
+        settings = settings or load_settings()
+        game, ship, boss, scoring = settings.game_settings, settings.spaceship, settings.boss, settings.scoring
+        self.n = n_games
+        self.size = size = game.world_size
+        self.cells = cells = size * size
+        self.fps_start = game.fps
+        self.fps_increase_rate = game.fps_increase_rate
+        self.initial_asteroids = game.initial_asteroids
+        self.asteroids_increase_interval = game.asteroids_increase_interval
+        self.boost_multiplier = ship.boost_speed_multiplier
+        self.boost_cooldown_ticks = ship.boost_cooldown
+        self.boss_size = boss.base_size
+        self.boss_delay = boss.spawn_delay
+        self.movement_interval = boss.movement_interval
+        self.attack_interval = boss.attack_interval
+        self.resource_points = scoring.resource_points
+        self.boss_bonus = scoring.boss_defeat_bonus
+        self.spawn_score_increase = scoring.boss_spawn_score_increase
+
+        games = np.arange(n_games)
+        self.rng_state = (seed + games).astype(np.uint64)
+        self.tick = 0
+
+        # Occupancy grid: per-kind counts and the free cells of every game
+        self.ship = np.zeros((n_games, cells), np.uint16)
+        self.asteroid = np.zeros((n_games, cells), np.uint16)
+        self.blocking = np.zeros((n_games, cells), np.uint16)
+        self.free_cells = np.tile(np.arange(cells, dtype=np.int32), (n_games, 1))
+        self.free_index = self.free_cells.copy()
+        self.free_len = np.full(n_games, cells, np.int64)
+
+        # Ship body as one ring buffer per game, head at body[start]; the
+        # body never outgrows the board, plus the block about to be added
+        capacity = 16
+        while capacity < cells + 1:
+            capacity *= 2
+        self.mask = capacity - 1
+        self.body = np.zeros((n_games, capacity), np.int32)
+        self.start = np.zeros(n_games, np.int64)
+        self.length = np.zeros(n_games, np.int64)
+        self.dx = np.ones(n_games, np.int64)
+        self.dy = np.zeros(n_games, np.int64)
+        self.boost = np.zeros(n_games, bool)
+        self.cooldown = np.zeros(n_games, np.int64)
+        self.new_block = np.zeros(n_games, bool)
+        self.direction_table = np.array(DIRECTIONS).T
+        self.initial_body = np.array([5 * size + 5, 5 * size + 4, 5 * size + 3])
+
+        self.state = np.full(n_games, MENU, np.int8)
+        self.score = np.zeros(n_games, np.int64)
+        self.high_score = np.zeros(n_games, np.int64)
+        self.fps = np.full(n_games, float(game.fps))
+
+        # -1 stands for Game's None: no cell was free when it spawned
+        self.resource = np.full(n_games, -1, np.int64)
+        self.asteroids = np.full((n_games, max(16, 2 * game.initial_asteroids)), -1, np.int64)
+        self.asteroid_count = np.zeros(n_games, np.int64)
+
+        self.boss_alive = np.zeros(n_games, bool)
+        self.boss_x = np.zeros(n_games, np.int64)
+        self.movement_timer = np.zeros(n_games, np.int64)
+        self.attack_timer = np.zeros(n_games, np.int64)
+        self.boss_spawn_score = np.full(n_games, boss.spawn_score, np.int64)
+        self.boss_spawn_timer = np.zeros(n_games, np.int64)
+        self.boss_points_collected = np.zeros(n_games, np.int64)
+        offsets = np.arange(self.boss_size)
+        self.boss_offsets = (offsets[:, None] * size + offsets).ravel()
+
+        # Projectiles: one slot group per volley, reused round robin. A volley
+        # leaves the board within lifetime ticks, so by the time its group
+        # comes round again it is gone.
+        volley = np.array(pattern_velocities(boss.attack_pattern, boss.projectiles_per_attack, boss.projectile_speed))
+        self.volley_size = len(volley)
+        slowest = np.abs(volley).max(axis=1).min()
+        lifetime = int(np.ceil(size / slowest)) + 1
+        self.volley_groups = lifetime // boss.attack_interval + 2
+        self.volley_x = self.boss_size // 2
+        self.volley_y = self.boss_size // 2 if boss.attack_pattern == 'ring' else self.boss_size
+        slots = self.volley_groups * self.volley_size
+        self.px = np.zeros((n_games, slots))
+        self.py = np.zeros((n_games, slots))
+        self.pvx = np.tile(volley[:, 0], (n_games, self.volley_groups))
+        self.pvy = np.tile(volley[:, 1], (n_games, self.volley_groups))
+        self.palive = np.zeros((n_games, slots), bool)
+        self.volleys_fired = np.zeros(n_games, np.int64)
+        self.volley_order = np.zeros((n_games, self.volley_groups), np.int64)
+
+        self.add_ship(games)
+        self.randomize_resource(games)
+        for _ in range(self.initial_asteroids):
+            self.spawn_asteroid(games)
+
+    # Random draws, advancing only the generators of the games in g
+    def randrange(self, g, n):
+        state = self.rng_state[g] + np.uint64(GAMMA)
+        self.rng_state[g] = state
+        z = (state ^ (state >> np.uint64(30))) * np.uint64(MIX1)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(MIX2)
+        z ^= z >> np.uint64(31)
+        return ((z >> np.uint64(11)).astype(np.float64) * UNIT * n).astype(np.int64)
+
+    def random_free_cell(self, g):
+        cells = np.full(len(g), -1, np.int64)
+        has_free = self.free_len[g] > 0
+        g = g[has_free]
+        cells[has_free] = self.free_cells[g, self.randrange(g, self.free_len[g])]
+        return cells
+
+    # FreeCells.add/discard and OccupancyGrid.add/remove, one cell per game in
+    # g. The per-cell arrays are indexed flat, row g * cells + cell: a 1-D
+    # gather costs a fraction of a 2-D one and these run dozens of times a tick.
+    def swap_free(self, rows, i, j):
+        free_cells, free_index = self.free_cells.reshape(-1), self.free_index.reshape(-1)
+        i, j = rows + i, rows + j
+        a, b = free_cells[i], free_cells[j]
+        free_cells[i], free_cells[j] = b, a
+        free_index[rows + a], free_index[rows + b] = j - rows, i - rows
+
+    def occupy(self, layer, g, cells):
+        rows = g * self.cells
+        flat = rows + cells
+        if layer is not None:
+            layer.reshape(-1)[flat] += 1
+        blocking = self.blocking.reshape(-1)
+        counts = blocking[flat] + 1
+        blocking[flat] = counts
+        first = counts == 1
+        if not first.all():
+            g, rows, flat = g[first], rows[first], flat[first]
+        length = self.free_len[g] - 1
+        self.free_len[g] = length
+        self.swap_free(rows, self.free_index.reshape(-1)[flat], length)
+
+    def vacate(self, layer, g, cells):
+        rows = g * self.cells
+        flat = rows + cells
+        if layer is not None:
+            layer.reshape(-1)[flat] -= 1
+        blocking = self.blocking.reshape(-1)
+        counts = blocking[flat] - 1
+        blocking[flat] = counts
+        last = counts == 0
+        if not last.all():
+            g, rows, flat = g[last], rows[last], flat[last]
+        length = self.free_len[g]
+        self.swap_free(rows, self.free_index.reshape(-1)[flat], length)
+        self.free_len[g] = length + 1
+
+    def head(self, g):
+        return self.body[g, self.start[g]]
+
+    def add_ship(self, g):
+        self.start[g] = 0
+        self.length[g] = len(self.initial_body)
+        for i, cell in enumerate(self.initial_body):
+            self.body[g, i] = cell
+            self.occupy(self.ship, g, np.full(len(g), cell))
+
+    def remove_ship(self, g):
+        for i in range(int(self.length[g].max(initial=0))):
+            g = g[self.length[g] > i]
+            self.vacate(self.ship, g, self.body[g, (self.start[g] + i) & self.mask])
+
+    def randomize_resource(self, g):
+        held = g[self.resource[g] >= 0]
+        self.vacate(None, held, self.resource[held])
+        cells = self.random_free_cell(g)
+        self.resource[g] = cells
+        spawned = cells >= 0
+        self.occupy(None, g[spawned], cells[spawned])
+
+    def spawn_asteroid(self, g):
+        cells = self.random_free_cell(g)
+        needed = int(self.asteroid_count[g].max(initial=0)) + 1
+        if needed > self.asteroids.shape[1]:
+            grown = np.full((self.n, 2 * self.asteroids.shape[1]), -1, np.int64)
+            grown[:, :self.asteroids.shape[1]] = self.asteroids
+            self.asteroids = grown
+        self.asteroids[g, self.asteroid_count[g]] = cells
+        self.asteroid_count[g] += 1
+        spawned = cells >= 0
+        self.occupy(self.asteroid, g[spawned], cells[spawned])
+
+    def remove_asteroids(self, g):
+        for i in range(int(self.asteroid_count[g].max(initial=0))):
+            listed = g[self.asteroid_count[g] > i]
+            cells = self.asteroids[listed, i]
+            held = cells >= 0
+            self.vacate(self.asteroid, listed[held], cells[held])
+        self.asteroids[g] = -1
+        self.asteroid_count[g] = 0
+
+    def boss_cells(self, g):
+        return self.boss_x[g, None] + self.boss_offsets
+
+    def place_boss(self, g, layer_update):
+        if not len(g):
+            return
+        cells = self.boss_cells(g)
+        for i in range(len(self.boss_offsets)):
+            layer_update(None, g, cells[:, i])
+
+    def spawn_boss(self, g):
+        self.boss_alive[g] = True
+        self.boss_x[g] = self.size // 2
+        self.movement_timer[g] = 0
+        self.attack_timer[g] = 0
+        self.place_boss(g, self.occupy)
+
+    def remove_boss(self, g):
+        self.place_boss(g, self.vacate)
+        self.palive[g] = False
+        self.boss_alive[g] = False
+
+    def game_over(self, g):
+        self.state[g] = GAME_OVER
+        self.high_score[g] = np.maximum(self.high_score[g], self.score[g])
+
+    def step(self, directions=None, actions=None):
+        """Advance every game one tick; directions and actions hold one input code per game."""
+        playing = np.flatnonzero(self.state == PLAYING)
+        idle = np.flatnonzero(self.state != PLAYING)
+        if len(playing):
+            self.update_playing(playing, directions, actions)
+        if actions is not None and len(idle):
+            self.start_game(idle[actions[idle] == START])
+        self.tick += 1
+
+    def update_playing(self, g, directions, actions):
+        self.move(g)
+        self.check_collision(g)
+        self.check_fail(g)
+        if directions is not None:
+            turning = g[directions[g] >= 0]
+            dx, dy = self.direction_table[:, directions[turning]]
+            # A direction reversing the ship is ignored
+            allowed = (dx != -self.dx[turning]) | (dy != -self.dy[turning])
+            turning = turning[allowed]
+            self.dx[turning], self.dy[turning] = dx[allowed], dy[allowed]
+        if actions is not None:
+            boosting = g[actions[g] == BOOST]
+            self.boost[boosting] = self.cooldown[boosting] == 0
+
+        waiting = g[~self.boss_alive[g] & (self.score[g] >= self.boss_spawn_score[g])]
+        self.boss_spawn_timer[waiting] += 1
+        ready = waiting[self.boss_spawn_timer[waiting] >= self.boss_delay]
+        self.spawn_boss(ready)
+        self.boss_spawn_timer[ready] = 0
+        self.boss_points_collected[ready] = 0
+
+        fighting = g[self.boss_alive[g]]
+        if len(fighting):
+            self.move_boss(fighting)
+            self.attack(fighting)
+            self.update_projectiles(fighting)
+            self.check_boss_collision(fighting)
+
+    def move(self, g):
+        boosted = self.boost[g] & (self.cooldown[g] == 0)
+        self.cooldown[g[boosted]] = self.boost_cooldown_ticks
+        self.boost[g[~boosted]] = False
+        steps = np.where(boosted, self.boost_multiplier, 1)
+        size, mask = self.size, self.mask
+        # Wrap around on every step so boosted segments stay on the board
+        for step in range(int(steps.max(initial=0))):
+            moving = g[steps > step]
+            y, x = np.divmod(self.head(moving), size)
+            new_head = (y + self.dy[moving]) % size * size + (x + self.dx[moving]) % size
+            growing = self.new_block[moving]
+            self.new_block[moving[growing]] = False
+            shrinking = moving[~growing]
+            self.length[shrinking] -= 1
+            self.vacate(self.ship, shrinking, self.body[shrinking, (self.start[shrinking] + self.length[shrinking]) & mask])
+            self.start[moving] = (self.start[moving] - 1) & mask
+            self.body[moving, self.start[moving]] = new_head
+            self.length[moving] += 1
+            self.occupy(self.ship, moving, new_head)
+        cooling = g[self.cooldown[g] > 0]
+        self.cooldown[cooling] -= 1
+
+    def check_collision(self, g):
+        g = g[self.resource[g] == self.head(g)]
+        self.randomize_resource(g)
+        self.new_block[g] = True
+        self.score[g] += self.resource_points
+        fighting = g[self.boss_alive[g]]
+        self.boss_points_collected[fighting] += 1
+        self.defeat_boss(fighting[self.boss_points_collected[fighting] >= BOSS_POINTS_NEEDED])
+        self.fps[g] += self.fps_increase_rate
+        self.spawn_asteroid(g[self.score[g] % self.asteroids_increase_interval == 0])
+
+    def defeat_boss(self, g):
+        self.score[g] += self.boss_bonus
+        self.remove_boss(g)
+        self.boss_spawn_score[g] += self.spawn_score_increase
+        self.boss_points_collected[g] = 0
+
+    def check_fail(self, g):
+        head = self.head(g)
+        self.game_over(g[(self.ship[g, head] > 1) | (self.asteroid[g, head] > 0)])
+
+    def move_boss(self, g):
+        self.movement_timer[g] += 1
+        g = g[self.movement_timer[g] >= self.movement_interval]
+        self.movement_timer[g] = 0
+        x = np.clip(self.boss_x[g] + self.randrange(g, 3) - 1, 0, self.size - self.boss_size)
+        # Vacating and reoccupying the same cells leaves the free cells as
+        # they were, so only a boss that really moves redoes its cells
+        g, x = g[x != self.boss_x[g]], x[x != self.boss_x[g]]
+        self.place_boss(g, self.vacate)
+        self.boss_x[g] = x
+        self.place_boss(g, self.occupy)
+
+    def attack(self, g):
+        self.attack_timer[g] += 1
+        g = g[self.attack_timer[g] >= self.attack_interval]
+        group = self.volleys_fired[g] % self.volley_groups
+        self.volley_order[g, group] = self.volleys_fired[g]
+        self.volleys_fired[g] += 1
+        slots = group[:, None] * self.volley_size + np.arange(self.volley_size)
+        rows = g[:, None]
+        self.px[rows, slots] = (self.boss_x[g] + self.volley_x)[:, None]
+        self.py[rows, slots] = self.volley_y
+        self.palive[rows, slots] = True
+        self.attack_timer[g] = 0
+
+    def update_projectiles(self, g):
+        x = self.px[g] + self.pvx[g]
+        y = self.py[g] + self.pvy[g]
+        self.px[g], self.py[g] = x, y
+        self.palive[g] &= (x >= 0) & (x < self.size) & (y >= 0) & (y < self.size)
+
+    def check_boss_collision(self, g):
+        touching = (self.ship[g[:, None], self.boss_cells(g)] > 0).any(axis=1)
+        cells = self.py[g].astype(np.int64) * self.size + self.px[g].astype(np.int64)
+        hit = (self.palive[g] & (cells == self.head(g)[:, None])).any(axis=1)
+        self.game_over(g[touching | hit])
+
+    def start_game(self, g):
+        if not len(g):
+            return
+        self.remove_ship(g)
+        self.add_ship(g)
+        self.dx[g], self.dy[g] = 1, 0
+        self.boost[g] = False
+        self.cooldown[g] = 0
+        self.score[g] = 0
+        self.remove_asteroids(g)
+        for _ in range(self.initial_asteroids):
+            self.spawn_asteroid(g)
+        self.state[g] = PLAYING
+        self.fps[g] = self.fps_start
+        self.remove_boss(g[self.boss_alive[g]])
+
+    def snapshot(self, i):
+        """State of game i in the form game_snapshot() gives for a Game."""
+        body = [int(self.body[i, (self.start[i] + k) & self.mask]) for k in range(self.length[i])]
+        boss = None
+        if self.boss_alive[i]:
+            projectiles = []
+            for group in np.argsort(self.volley_order[i], kind='stable'):
+                for slot in range(group * self.volley_size, (group + 1) * self.volley_size):
+                    if self.palive[i, slot]:
+                        projectiles.append((float(self.px[i, slot]), float(self.py[i, slot])))
+            boss = (int(self.boss_x[i]), int(self.movement_timer[i]), int(self.attack_timer[i]), projectiles)
+        return (
+            self.tick, STATES[self.state[i]], int(self.score[i]), int(self.high_score[i]), float(self.fps[i]),
+            int(self.boss_spawn_score[i]), int(self.boss_spawn_timer[i]), int(self.boss_points_collected[i]),
+            body, (int(self.dx[i]), int(self.dy[i])), bool(self.boost[i]), int(self.cooldown[i]), bool(self.new_block[i]),
+            none_if_negative(self.resource[i]), [none_if_negative(cell) for cell in self.asteroids[i, :self.asteroid_count[i]]],
+            boss, self.free_cells[i, :self.free_len[i]].tolist(),
+        )
+
+def none_if_negative(cell):
+    return None if cell < 0 else int(cell)
+
+def game_snapshot(game):
+    """State of a scalar Game comparable with BatchEnv.snapshot(), free cell order included."""
+    ship = game.spaceship
+    boss = game.boss
+    if boss is not None:
+        boss = (int(boss.pos.x), boss.movement_timer, boss.attack_timer, boss.projectiles.positions())
+    free = game.grid.free
+    return (
+        game.tick, game.state.name, game.score, game.high_score, float(game.fps),
+        game.boss_spawn_score, game.boss_spawn_timer, game.boss_points_collected,
+        list(ship.body), (int(ship.direction.x), int(ship.direction.y)), ship.boost, ship.boost_cooldown, ship.new_block,
+        game.resource.cell, [asteroid.cell for asteroid in game.asteroids],
+        boss, free.cells[:free.length].tolist(),
+    )
@@ -0,0 +1,224 @@
+import random
+from array import array
+
+# Entity kinds tracked by the occupancy grid
+SHIP = 0
+ASTEROID = 1
+RESOURCE = 2
+PROJECTILE = 3
+BOSS = 4
+KINDS = 5
+
+# Projectiles pass through cells quickly, so they do not block spawning
+BLOCKS_SPAWN = (True, True, True, False, True)
+
+class FreeCells:
+    """Set of free cells supporting O(1) add, discard and uniform sampling.
+
+    cells[:length] holds the free cells and index maps every cell to its slot,
+    so removals swap the cell with the last free one instead of shifting.
+    """
+
+    def __init__(self, size):
+        total = size * size
+        self.cells = array('i', range(total))
+        self.index = array('i', range(total))
+        self.length = total
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, cell):
+        return self.index[cell] < self.length
+
+    def _swap(self, i, j):
+        cells, index = self.cells, self.index
+        a, b = cells[i], cells[j]
+        cells[i], cells[j] = b, a
+        index[a], index[b] = j, i
+
+    def discard(self, cell):
+        self.length -= 1
+        self._swap(self.index[cell], self.length)
+
+    def add(self, cell):
+        self._swap(self.index[cell], self.length)
+        self.length += 1
+
+    def sample(self, rng=random):
+        if not self.length:
+            return None
+        return self.cells[rng.randrange(self.length)]
+
+class SpatialHash:
+    """Cells of one entity kind bucketed by square regions of the board.
+
+    A rectangle query only visits the buckets it overlaps, so its cost follows
+    the area asked for and what is in it, not the size of the board.
+    """
+
+    def __init__(self, size, bucket_size=16):
+        self.size = size
+        self.bucket_size = bucket_size
+        self.row = -(-size // bucket_size)
+        self.buckets = [set() for _ in range(self.row * self.row)]
+
+    def bucket(self, cell):
+        y, x = divmod(cell, self.size)
+        return self.buckets[y // self.bucket_size * self.row + x // self.bucket_size]
+
+    def spans(self, start, length):
+        # A rectangle side wrapping past the board edge becomes two spans
+        start %= self.size
+        end = start + min(length, self.size)
+        if end <= self.size:
+            return [(start, end)]
+        return [(start, self.size), (0, end - self.size)]
+
+    def query(self, x, y, width, height):
+        """Yield the cells inside the rectangle, which may wrap around the edges."""
+        size, bucket_size, buckets = self.size, self.bucket_size, self.buckets
+        for y0, y1 in self.spans(y, height):
+            for x0, x1 in self.spans(x, width):
+                for by in range(y0 // bucket_size, (y1 - 1) // bucket_size + 1):
+                    for bx in range(x0 // bucket_size, (x1 - 1) // bucket_size + 1):
+                        for cell in buckets[by * self.row + bx]:
+                            cy, cx = divmod(cell, size)
+                            if y0 <= cy < y1 and x0 <= cx < x1:
+                                yield cell
+
+class OccupancyGrid:
+    """Per-cell entity counts, one layer per entity kind.
+
+    Cells are integers (y * size + x) so every update and query is a single
+    array access, independent of how many entities are on the board. The grid
+    also keeps the set of free cells in sync for spawning and, once a renderer
+    sets changed to a set, records every cell touched since the last frame.
+    rng is the random source for spawning, shared by the entities of a game.
+    The first cells_in() query of a kind builds a SpatialHash of its occupied
+    cells, kept up to date from then on, so headless games never pay for it.
+    """
+
+    def __init__(self, size, rng=random):
+        self.size = size
+        self.rng = rng
+        self.changed = None
+        self.clear()
+
+    def cell(self, x, y):
+        return int(y) * self.size + int(x)
+
+    def add(self, kind, cell):
+        layer = self.layers[kind]
+        layer[cell] += 1
+        index = self.index[kind]
+        if index is not None and layer[cell] == 1:
+            index.bucket(cell).add(cell)
+        if self.changed is not None:
+            self.changed.add(cell)
+        if BLOCKS_SPAWN[kind]:
+            self.blocking[cell] += 1
+            if self.blocking[cell] == 1:
+                self.free.discard(cell)
+
+    def remove(self, kind, cell):
+        layer = self.layers[kind]
+        layer[cell] -= 1
+        index = self.index[kind]
+        if index is not None and not layer[cell]:
+            index.bucket(cell).discard(cell)
+        if self.changed is not None:
+            self.changed.add(cell)
+        if BLOCKS_SPAWN[kind]:
+            self.blocking[cell] -= 1
+            if self.blocking[cell] == 0:
+                self.free.add(cell)
+
+    def move(self, kind, old_cell, new_cell):
+        self.remove(kind, old_cell)
+        self.add(kind, new_cell)
+
+    def touch(self, cell):
+        """Mark a cell as changed without altering its occupancy."""
+        if self.changed is not None:
+            self.changed.add(cell)
+
+    def take_changed(self):
+        changed = self.changed
+        self.changed = set()
+        return changed
+
+    def count(self, kind, cell):
+        return self.layers[kind][cell]
+
+    def cells_in(self, kind, x, y, width, height):
+        """Occupied cells of a kind inside a rectangle, which may wrap around the edges."""
+        index = self.index[kind]
+        if index is None:
+            index = self.index[kind] = SpatialHash(self.size)
+            for cell, count in enumerate(self.layers[kind]):
+                if count:
+                    index.bucket(cell).add(cell)
+        return index.query(x, y, width, height)
+
+    def random_free_cell(self):
+        """Uniformly sample an unoccupied cell, or None if the board is full."""
+        return self.free.sample(self.rng)
+
+    def clear(self):
+        total = self.size * self.size
+        self.layers = [array('H', bytes(2 * total)) for _ in range(KINDS)]
+        self.blocking = array('H', bytes(2 * total))
+        self.free = FreeCells(self.size)
+        self.index = [None] * KINDS
+
+class CellRing:
+    """Ring buffer of integer cells, front first, with O(1) push and pop.
+
+    The backing array doubles when full, so growing the ship is amortized O(1)
+    and moving it never copies the body.
+    """
+
+    def __init__(self, cells=()):
+        capacity = 16
+        while capacity < len(cells):
+            capacity *= 2
+        self.data = array('i', bytes(4 * capacity))
+        self.mask = capacity - 1
+        self.start = 0
+        self.length = 0
+        for cell in reversed(cells):
+            self.push_front(cell)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('CellRing index out of range')
+        return self.data[(self.start + index) & self.mask]
+
+    def __iter__(self):
+        data, mask, start = self.data, self.mask, self.start
+        for i in range(self.length):
+            yield data[(start + i) & mask]
+
+    def push_front(self, cell):
+        if self.length > self.mask:
+            self._grow()
+        self.start = (self.start - 1) & self.mask
+        self.data[self.start] = cell
+        self.length += 1
+
+    def pop_back(self):
+        self.length -= 1
+        return self.data[(self.start + self.length) & self.mask]
+
+    def _grow(self):
+        cells = array('i', self)
+        cells.extend(array('i', bytes(4 * len(cells))))
+        self.data = cells
+        self.mask = len(cells) - 1
+        self.start = 0
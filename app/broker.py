@@ -0,0 +1,289 @@
+"""Device broker: one process owns /dev/mydev and serves many clients.
+
+Clients connect to a Unix socket and send requests of the form
+
+    u16 n_writes, u16 n_reads, n_writes * (u32 register, u32 value), n_reads * u32 register
+
+(little-endian, registers are the WR_*/RD_* commands). The broker answers
+each request with n_reads u32 values; write-only requests get no answer.
+A request naming any other register gets its client disconnected; the
+other clients are not affected. Requests are handled in the order they
+arrive on a connection, and all
+requests collected in one loop iteration go to the device together as
+batched transfers, so concurrent front-ends neither race on register
+selection nor pay a syscall pair per access.
+
+Run it from the repository root:
+
+    python app/broker.py [--socket PATH]
+
+DE2I_BACKEND=fake serves a FakeDevice instead of the board (see hal.open_device).
+"""
+import argparse
+import errno
+import os
+import selectors
+import socket
+import stat
+import struct
+from hal import DeviceBackend
+from constants import BROKER_PATH, BROKER_HEADER_SIZE, BATCH_MAX, WRITE_REGISTERS, READ_REGISTERS
+
+HEADER = struct.Struct('<HH')
+
+def pack_request(writes, reads):
+    words = [word for write in writes for word in write]
+    return HEADER.pack(len(writes), len(reads)) + struct.pack(f'<{len(words) + len(reads)}I', *words, *reads)
+
+class Client:
+    def __init__(self, conn):
+        self.conn = conn
+        self.buffer = bytearray()
+        self.output = bytearray()
+
+    def requests(self):
+        """Pop the complete requests received so far.
+
+        Raises ValueError on a register that is not a WR_* (writes) or RD_*
+        (reads) command, which would otherwise fail in the middle of a batch.
+        """
+        while len(self.buffer) >= BROKER_HEADER_SIZE:
+            n_writes, n_reads = HEADER.unpack_from(self.buffer)
+            size = BROKER_HEADER_SIZE + 4 * (2 * n_writes + n_reads)
+            if len(self.buffer) < size:
+                return
+            words = struct.unpack_from(f'<{2 * n_writes + n_reads}I', self.buffer, BROKER_HEADER_SIZE)
+            del self.buffer[:size]
+            writes = list(zip(words[:2 * n_writes:2], words[1:2 * n_writes:2]))
+            reads = list(words[2 * n_writes:])
+            for register, _ in writes:
+                if register not in WRITE_REGISTERS:
+                    raise ValueError(f'not a writable register: {register}')
+            for register in reads:
+                if register not in READ_REGISTERS:
+                    raise ValueError(f'not a readable register: {register}')
+            yield writes, reads
+
+def remove_stale_socket(path):
+    """Unlink a socket left by a broker that died; refuse if one still listens on it."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+    else:
+        raise OSError(errno.EADDRINUSE, f'a device broker is already listening on {path}')
+    finally:
+        probe.close()
+
+class Broker:
+    def __init__(self, backend, path=BROKER_PATH):
+        self.backend = backend
+        self.path = path
+        self.selector = selectors.DefaultSelector()
+        self.clients = {}
+        self.requests = 0
+        self.batches = 0
+        self.dropped = 0
+        self.running = False
+
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            remove_stale_socket(path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen()
+        self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ)
+
+    def serve_forever(self):
+        self.running = True
+        try:
+            while self.running:
+                self.poll(timeout=0.1)
+        finally:
+            self.close()
+
+    def poll(self, timeout=None):
+        """Read what the clients sent, run it on the device and answer."""
+        pending = []
+        for key, mask in self.selector.select(timeout):
+            if key.fileobj is self.server:
+                self.accept()
+            elif mask & selectors.EVENT_READ:
+                client = self.clients[key.fileobj]
+                if self.receive(client):
+                    try:
+                        pending.extend((client, request) for request in list(client.requests()))
+                    except ValueError:
+                        self.drop(client, faulty=True)
+            if mask & selectors.EVENT_WRITE and key.fileobj in self.clients:
+                self.send(self.clients[key.fileobj])
+
+        if pending:
+            self.execute(pending)
+
+    def accept(self):
+        conn, _ = self.server.accept()
+        conn.setblocking(False)
+        self.clients[conn] = Client(conn)
+        self.selector.register(conn, selectors.EVENT_READ)
+
+    def receive(self, client):
+        try:
+            data = client.conn.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return True
+        except ConnectionError:
+            data = b''
+        if not data:
+            self.drop(client)
+            return False
+        client.buffer += data
+        return True
+
+    def execute(self, pending):
+        # Clients dropped while this poll went on get none of their requests run
+        pending = [(client, request) for client, request in pending if client.conn in self.clients]
+        try:
+            values = self.transfer(pending)
+        except (LookupError, ValueError):
+            # A request the backend rejected: redo the requests one at a time
+            # so that only the clients whose requests fail get dropped. An
+            # OSError is the device failing, not a client, and stops the broker
+            values = []
+            served = []
+            for client, request in pending:
+                if client.conn not in self.clients:
+                    continue
+                try:
+                    values += self.transfer([(client, request)])
+                except (LookupError, ValueError):
+                    self.drop(client, faulty=True)
+                else:
+                    served.append((client, request))
+            pending = served
+
+        self.requests += len(pending)
+        start = 0
+        for client, (_, request_reads) in pending:
+            end = start + len(request_reads)
+            if request_reads and client.conn in self.clients:
+                client.output += struct.pack(f'<{end - start}I', *values[start:end])
+                self.send(client)
+            start = end
+
+    def transfer(self, pending):
+        # All writes of the requests first, in arrival order, then all reads
+        writes = [write for _, (request_writes, _) in pending for write in request_writes]
+        reads = [read for _, (_, request_reads) in pending for read in request_reads]
+        values = []
+        while writes or reads:
+            chunk_writes, writes = writes[:BATCH_MAX], writes[BATCH_MAX:]
+            chunk_reads, reads = reads[:BATCH_MAX], reads[BATCH_MAX:]
+            values += self.backend.transfer(chunk_writes, chunk_reads)
+            self.batches += 1
+        return values
+
+    def send(self, client):
+        try:
+            sent = client.conn.send(client.output)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except ConnectionError:
+            self.drop(client)
+            return
+        del client.output[:sent]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.output else 0)
+        self.selector.modify(client.conn, events)
+
+    def drop(self, client, faulty=False):
+        if client.conn not in self.clients:
+            return
+        if faulty:
+            self.dropped += 1
+        self.selector.unregister(client.conn)
+        del self.clients[client.conn]
+        client.conn.close()
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        for client in list(self.clients.values()):
+            self.drop(client)
+        self.selector.unregister(self.server)
+        self.server.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def stats(self):
+        return {
+            'clients': len(self.clients),
+            'requests': self.requests,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'syscalls': self.backend.syscalls,
+        }
+
+class BrokerBackend(DeviceBackend):
+    """Register access through a running broker, usable wherever a backend is.
+
+    Writes are sent without waiting; a request with reads costs one send and
+    one receive. syscalls counts those socket calls.
+    """
+
+    def __init__(self, path=BROKER_PATH):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.syscalls = 0
+
+    def read(self, register):
+        return self.transfer([], [register])[0]
+
+    def events(self):
+        # The broker owns the device; opening it here would bypass the broker
+        raise NotImplementedError('input events are not forwarded by the broker, poll the buttons instead')
+
+    def write(self, register, value):
+        self.transfer([(register, value & 0xFFFFFFFF)], [])
+
+    def transfer(self, writes, reads):
+        self.sock.sendall(pack_request(writes, reads))
+        self.syscalls += 1
+        if not reads:
+            return []
+        size = 4 * len(reads)
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            self.syscalls += 1
+            if not chunk:
+                raise ConnectionError('device broker closed the connection')
+            data += chunk
+        return list(struct.unpack(f'<{len(reads)}I', data))
+
+    def close(self):
+        self.sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--socket', default=BROKER_PATH)
+    args = parser.parse_args()
+
+    from hal import open_device
+    backend = open_device()
+    try:
+        broker = Broker(backend, args.socket)
+    except OSError as error:
+        backend.close()
+        raise SystemExit(f'>>> {error.strerror}')
+    print(f'>>> device broker listening on {args.socket}')
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f'>>> {broker.stats()}')
+    backend.close()
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,38 @@ WR_L_DISPLAY = 24931
 WR_R_DISPLAY = 24932
 WR_RED_LEDS = 24933
 WR_GREEN_LEDS = 24934
+RD_EVENTS = 24935
+
+# Registers a transfer may write and read
+WRITE_REGISTERS = (WR_L_DISPLAY, WR_R_DISPLAY, WR_RED_LEDS, WR_GREEN_LEDS)
+READ_REGISTERS = (RD_SWITCHES, RD_PBUTTONS)
+
+# Batched transfer: struct batch_transfer from include/ioctl_cmds.h
+BATCH_MAX = 8
+BATCH_SIZE = 4 * (2 + 2 * BATCH_MAX + BATCH_MAX)
+RW_BATCH = (3 << 30) | (BATCH_SIZE << 16) | (ord('a') << 8) | ord('h')
+
+# Unix socket of the device broker (broker.py) and its request header:
+# number of writes, number of reads (u16 each)
+BROKER_PATH = '/tmp/mydev.sock'
+BROKER_HEADER_SIZE = 4
+
+# Size of a change event read in RD_EVENTS mode: switches, buttons (u32 each)
+EVENT_SIZE = 8
+# States the driver queues per reader in RD_EVENTS mode; older ones are dropped
+EVENT_QUEUE_LEN = 64
+
+# mmap window over the BAR0 peripherals page and register offsets inside it
+MMAP_WINDOW_SIZE = 0x1000
+
+REGISTER_OFFSETS = {
+    RD_SWITCHES: 0x080,
+    RD_PBUTTONS: 0x140,
+    WR_L_DISPLAY: 0x160,
+    WR_R_DISPLAY: 0x040,
+    WR_RED_LEDS: 0x120,
+    WR_GREEN_LEDS: 0x100
+}
 
 SEVEN_SEGMENT_OPTIONS = {
     0: 0b01000000,
@@ -18,6 +50,12 @@ SEVEN_SEGMENT_OPTIONS = {
     7: 0b01111000,
     8: 0b00000000,
     9: 0b00010000,
+    10: 0b00001000,
+    11: 0b00000011,
+    12: 0b01000110,
+    13: 0b00100001,
+    14: 0b00000110,
+    15: 0b00001110,
     "OFF": 0b11111111
 }
 
@@ -28,4 +66,22 @@ BUTTONS_OPTIONS = {
     '0b1101': "LEFT",
     '0b1110': "RIGHT",
     '0b1100': "START" # RIGHT-LEFT
-}
\ No newline at end of file
+}
+
+# Integer-keyed view of BUTTONS_OPTIONS (buttons are active-low)
+BUTTON_CODES = {int(code, 2): name for code, name in BUTTONS_OPTIONS.items()}
+
+# Button name for every 4-bit mask, None for unmapped combinations
+BUTTON_NAMES = tuple(BUTTON_CODES.get(mask) for mask in range(16))
+
+ALL_SWITCHES = 0b111111111111111111
+
+RED_LED_COUNT = 18
+GREEN_LED_COUNT = 9
+
+BUTTON_BITS = {
+    "RIGHT": 0,
+    "LEFT": 1,
+    "UP": 2,
+    "DOWN": 3
+}
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import selectors
+import time
+from fcntl import ioctl
+from constants import RD_EVENTS, EVENT_SIZE
+from poller import button_edges
+
+class DeviceEvents:
+    """Switch/button change notifications read from a waitable file descriptor.
+
+    On the board fd is a dedicated open of /dev/mydev, switched to events mode
+    with RD_EVENTS: the driver samples the inputs and queues every change, and
+    read() blocks until one is queued, so waiting costs no CPU. Without the
+    board, FakeDevice.events() passes a read callable taking the same 8-byte
+    events from its own queue, with fd only signalling that one is pending.
+    """
+
+    def __init__(self, fd, select_events=True, read=None):
+        self.fd = fd
+        self.read = read or (lambda: os.read(fd, EVENT_SIZE))
+        if select_events:
+            ioctl(fd, RD_EVENTS)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(fd, selectors.EVENT_READ)
+        self.switches = None
+        self.buttons = None
+        self.events = 0
+
+    def fileno(self):
+        return self.fd
+
+    def read_event(self):
+        data = self.read()
+        self.events += 1
+        self.switches = int.from_bytes(data[:4], 'little')
+        self.buttons = int.from_bytes(data[4:], 'little')
+        return self.switches, self.buttons
+
+    def wait(self, timeout=None):
+        """Return the next (switches, buttons) state, or None on timeout."""
+        if not self.selector.select(timeout):
+            return None
+        return self.read_event()
+
+    def wait_for(self, predicate, timeout=None):
+        """Block until predicate(switches, buttons) holds; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            state = self.wait(remaining)
+            if state is None:
+                return False
+            if predicate(*state):
+                return True
+
+    async def next_event(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        loop.add_reader(self.fd, lambda: future.done() or future.set_result(None))
+        try:
+            await future
+        finally:
+            loop.remove_reader(self.fd)
+        return self.read_event()
+
+    def drain(self):
+        """Button press/release edges for every change pending, without blocking."""
+        events = []
+        while self.selector.select(0):
+            old_buttons = self.buttons
+            _, buttons = self.read_event()
+            if old_buttons is not None and buttons != old_buttons:
+                events.extend(button_edges(old_buttons, buttons, time.perf_counter_ns()))
+        return events
+
+    def stop(self):
+        self.selector.close()
+        os.close(self.fd)
+
+    def stats(self):
+        return {'events': self.events}
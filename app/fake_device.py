@@ -0,0 +1,166 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from hal import DeviceBackend
+from constants import RD_SWITCHES, RD_PBUTTONS, WR_L_DISPLAY, WR_R_DISPLAY, BUTTON_BITS, MMAP_WINDOW_SIZE, REGISTER_OFFSETS, EVENT_QUEUE_LEN
+
+# Modelled cost of one syscall, in seconds: a bare PCIe register round trip,
+# and the original driver that printk'd on every read and write
+LATENCY_PRESETS = {
+    'none': 0.0,
+    'pcie': 2e-6,
+    'printk': 50e-6
+}
+
+class FakeDevice(DeviceBackend):
+    """In-process stand-in for the DE2i-150 registers behind /dev/mydev.
+
+    Registers are keyed by the same ioctl commands the driver uses to select
+    them and live in a window laid out like the BAR0 peripherals page, at the
+    offsets my_ioctl() uses. Buttons are active-low, like on the board.
+
+    Every modelled syscall costs latency seconds plus gaussian jitter,
+    spent busy-waiting so that microsecond delays are honoured.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, seed=None):
+        self.window = bytearray(MMAP_WINDOW_SIZE)
+        self.words = memoryview(self.window).cast('I')
+        self.index = {register: offset // 4 for register, offset in REGISTER_OFFSETS.items()}
+        self.words[self.index[RD_PBUTTONS]] = 0b1111
+        self.words[self.index[WR_L_DISPLAY]] = 0xFFFFFFFF
+        self.words[self.index[WR_R_DISPLAY]] = 0xFFFFFFFF
+        # Counted like the ioctl + read/write pair the real driver needs
+        self.syscalls = 0
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.io_time_ns = 0
+        self.event_fd = None
+        self.event_read_fd = None
+        self.event_queue = deque(maxlen=EVENT_QUEUE_LEN)
+        self.event_lock = threading.Lock()
+
+    def syscall(self, count=1):
+        self.syscalls += count
+        if not self.latency and not self.jitter:
+            return
+        delay = count * self.latency + (self.random.gauss(0, self.jitter) if self.jitter else 0)
+        start = time.perf_counter_ns()
+        end = start + max(0, round(delay * 1e9))
+        while time.perf_counter_ns() < end:
+            pass
+        self.io_time_ns += time.perf_counter_ns() - start
+
+    def register(self, register):
+        """Current register value, without modelling a syscall."""
+        return self.words[self.index[register]]
+
+    def read(self, register):
+        self.syscall(2)
+        return self.words[self.index[register]]
+
+    def write(self, register, value):
+        self.syscall(2)
+        self.words[self.index[register]] = value & 0xFFFFFFFF
+
+    def transfer(self, writes, reads):
+        # One RW_BATCH ioctl on the real driver
+        self.syscall()
+        for register, value in writes:
+            self.words[self.index[register]] = value & 0xFFFFFFFF
+        return [self.words[self.index[register]] for register in reads]
+
+    def press(self, *names):
+        mask = 0b1111
+        for name in names:
+            mask &= ~(1 << BUTTON_BITS[name])
+        self.set_input(RD_PBUTTONS, mask)
+
+    def release(self):
+        self.set_input(RD_PBUTTONS, 0b1111)
+
+    def set_switches(self, mask):
+        self.set_input(RD_SWITCHES, mask)
+
+    def set_input(self, register, value):
+        changed = self.register(register) != value
+        self.words[self.index[register]] = value
+        if changed:
+            self.push_event()
+
+    def play(self, timeline):
+        """Apply (seconds, method, *args) steps on a background thread.
+
+        For example [(0.5, 'press', 'UP'), (0.6, 'release'), (1.0, 'set_switches', 0b11)].
+        Times are relative to the call. Returns the started thread.
+        """
+        start = time.perf_counter()
+
+        def run():
+            for at, method, *args in sorted(timeline, key=lambda step: step[0]):
+                delay = start + at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                getattr(self, method)(*args)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def open_events(self):
+        """Queue change events like the driver's RD_EVENTS mode.
+
+        Like the driver, the queue starts with the current state and keeps the
+        last EVENT_QUEUE_LEN states, dropping the oldest. The returned fd is
+        readable while events are queued; pop_event() takes the oldest.
+        """
+        with self.event_lock:
+            # A new reader replaces the previous one: its pipe's write end is
+            # closed, so the old read end sees end of file instead of leaking
+            self.close_events()
+            self.event_read_fd, self.event_fd = os.pipe()
+            # The press()/release() caller must never wait on the reader
+            os.set_blocking(self.event_fd, False)
+            self.event_queue.clear()
+        self.push_event()
+        return self.event_read_fd
+
+    def close_events(self):
+        if self.event_fd is not None:
+            os.close(self.event_fd)
+            self.event_fd = None
+
+    def events(self):
+        from events import DeviceEvents
+        return DeviceEvents(self.open_events(), select_events=False, read=self.pop_event)
+
+    def push_event(self):
+        if self.event_fd is None:
+            return
+        event = self.register(RD_SWITCHES).to_bytes(4, 'little') + self.register(RD_PBUTTONS).to_bytes(4, 'little')
+        with self.event_lock:
+            # The pipe holds a single byte while the queue is not empty
+            if not self.event_queue:
+                try:
+                    os.write(self.event_fd, b'\0')
+                except BlockingIOError:
+                    # Already signalled; the event still joins the queue
+                    pass
+            self.event_queue.append(event)
+
+    def pop_event(self):
+        with self.event_lock:
+            event = self.event_queue.popleft()
+            if not self.event_queue:
+                os.read(self.event_read_fd, 1)
+        return event
+
+    def close(self):
+        with self.event_lock:
+            self.close_events()
+
+    def stats(self):
+        return {'syscalls': self.syscalls, 'io_time_ms': round(self.io_time_ns / 1e6, 3)}
@@ -1,38 +1,45 @@
-import os
+import time
+# Startup clock for the time-to-first-frame report, started before pygame loads
+IMPORT_STARTED = time.perf_counter()
 import random
+import hashlib
 import pygame
-import json
 from pygame.math import Vector2
 from abc import ABC, abstractmethod
 from enum import Enum, auto
 from collections import deque
-import math
+from loop import FixedTimestep
+from profiler import FrameProfiler, NullProfiler
+from sprites import SpriteCache
+from render import TextCache, DirtyRectRenderer, CellArrayRenderer, Camera, np
+from board import OccupancyGrid, CellRing, SHIP, ASTEROID, RESOURCE, PROJECTILE, BOSS
+from projectiles import projectile_buffer, pattern_velocities
+from settings import load_settings, BOSS_POINTS_NEEDED, HIGH_SCORE_PATH, LAST_GAME_PATH, FRAME_PROFILE_PATH
 
-# Load configuration
-with open('config.json', 'r') as config_file:
-    CONFIG = json.load(config_file)
-
-# Initialize Pygame
-pygame.init()
+# Load configuration (config.json next to the package, whatever the CWD)
+SETTINGS = load_settings()
 
 # Game settings
-GAME_SETTINGS = CONFIG['game_settings']
-COLORS = CONFIG['colors']
-SPACESHIP_CONFIG = CONFIG['spaceship']
-BOSS_CONFIG = CONFIG['boss']
-SCORING = CONFIG['scoring']
-
-CELL_SIZE = GAME_SETTINGS['cell_size']
-CELL_NUMBER = GAME_SETTINGS['cell_number']
-SCREEN_SIZE = CELL_NUMBER * CELL_SIZE
-
-SPACE_COLOR = tuple(COLORS['space'])
-STAR_COLOR = tuple(COLORS['star'])
-SHIP_COLOR = tuple(COLORS['ship'])
-ASTEROID_COLOR = tuple(COLORS['asteroid'])
-RESOURCE_COLOR = tuple(COLORS['resource'])
-BOSS_COLOR = tuple(COLORS['boss'])
-BOSS_PROJECTILE_COLOR = tuple(COLORS['boss_projectile'])
+GAME_SETTINGS = SETTINGS.game_settings
+COLORS = SETTINGS.colors
+SPACESHIP_CONFIG = SETTINGS.spaceship
+BOSS_CONFIG = SETTINGS.boss
+SCORING = SETTINGS.scoring
+
+CELL_SIZE = GAME_SETTINGS.cell_size
+# The simulated board is world_size cells wide; the window shows cell_number of them
+CELL_NUMBER = GAME_SETTINGS.world_size
+VIEW_CELLS = GAME_SETTINGS.cell_number
+RENDER_FPS = GAME_SETTINGS.render_fps
+SCREEN_SIZE = VIEW_CELLS * CELL_SIZE
+
+SPACE_COLOR = COLORS.space
+STAR_COLOR = COLORS.star
+SHIP_COLOR = COLORS.ship
+ASTEROID_COLOR = COLORS.asteroid
+RESOURCE_COLOR = COLORS.resource
+BOSS_COLOR = COLORS.boss
+BOSS_PROJECTILE_COLOR = COLORS.boss_projectile
 
 class GameState(Enum):
     MENU = auto()
@@ -79,9 +86,10 @@ class KeyboardInput(InputHandler):
                 elif event.key == pygame.K_SPACE:
                     self.action_queue.append("BOOST")
 
-class ExternalControlInput(InputHandler):
-    def __init__(self, fd):
-        self.fd = fd
+class ScriptedInput(InputHandler):
+    """Input handler fed programmatically, used by the headless simulation."""
+
+    def __init__(self):
         self.direction_queue = deque()
         self.action_queue = deque()
 
@@ -92,89 +100,141 @@ class ExternalControlInput(InputHandler):
         return self.action_queue.popleft() if self.action_queue else None
 
     def process_events(self, events):
-        from utils import read_button
-        from constants import BUTTONS_OPTIONS
-        button = read_button(fd=self.fd, show_output_msg=False)
-        if BUTTONS_OPTIONS[button] == "UP":
-            self.direction_queue.append(Vector2(0, -1))
-        elif BUTTONS_OPTIONS[button] == "DOWN":
-            self.direction_queue.append(Vector2(0, 1))
-        elif BUTTONS_OPTIONS[button] == "LEFT":
-            self.direction_queue.append(Vector2(-1, 0))
-        elif BUTTONS_OPTIONS[button] == "RIGHT":
-            self.direction_queue.append(Vector2(1, 0))
-        elif BUTTONS_OPTIONS[button] == "START":
-            self.action_queue.append("START")
-        elif BUTTONS_OPTIONS[button] == "BOOST":
-            self.action_queue.append("BOOST")
+        pass
+
+    def push(self, direction=None, action=None):
+        if direction is not None:
+            self.direction_queue.append(direction)
+        if action is not None:
+            self.action_queue.append(action)
+
+class ExternalControlInput(InputHandler):
+    """Board push buttons, read from an input source.
+
+    source is a started poller.ButtonPoller or an events.DeviceEvents; both
+    provide drain() returning the button press/release edges since last call.
+    """
+
+    DIRECTIONS = {
+        "UP": Vector2(0, -1),
+        "DOWN": Vector2(0, 1),
+        "LEFT": Vector2(-1, 0),
+        "RIGHT": Vector2(1, 0)
+    }
+
+    def __init__(self, source):
+        self.direction_queue = deque()
+        self.action_queue = deque()
+        self.source = source
 
+    def get_direction(self):
+        return self.direction_queue.popleft() if self.direction_queue else None
 
+    def get_action(self):
+        return self.action_queue.popleft() if self.action_queue else None
+
+    def process_events(self, events):
+        # Only press edges count, so a held button enqueues a single input
+        for event in self.source.drain():
+            if not event.pressed:
+                continue
+            if event.name in self.DIRECTIONS:
+                self.direction_queue.append(self.DIRECTIONS[event.name])
+            elif event.name in ("START", "BOOST"):
+                self.action_queue.append(event.name)
+
+    def close(self):
+        self.source.stop()
 
 class Spaceship:
-    def __init__(self):
-        self.body = [Vector2(5, 5), Vector2(4, 5), Vector2(3, 5)]
+    def __init__(self, grid):
+        self.grid = grid
+        self.body = CellRing(self.initial_body())
+        for cell in self.body:
+            grid.add(SHIP, cell)
         self.direction = Vector2(1, 0)
         self.new_block = False
         self.boost = False
         self.boost_cooldown = 0
-        self.boost_trail = []
         self.trail_length = 5  # Número de segmentos do rastro
-
-    def draw(self, screen):
+        self.boost_trail = deque(maxlen=self.trail_length)
+        # Head cell and step count of the last move, used for interpolation
+        self.prev_head = self.body[0]
+        self.last_steps = 1
+
+    def initial_body(self):
+        return [self.grid.cell(5, 5), self.grid.cell(4, 5), self.grid.cell(3, 5)]
+
+    def head_position(self, alpha):
+        y, x = divmod(self.body[0], CELL_NUMBER)
+        prev_y, prev_x = divmod(self.prev_head, CELL_NUMBER)
+        # Do not slide across the board when the head wrapped around
+        if abs(x - prev_x) + abs(y - prev_y) > self.last_steps:
+            return x, y
+        return prev_x + (x - prev_x) * alpha, prev_y + (y - prev_y) * alpha
+
+    def draw(self, screen, camera, sprites, alpha=1.0):
+        volatile = []
         # Desenhar o rastro de boost apenas quando o boost estiver ativo
         if self.boost:
-            for i, trail_pos in enumerate(self.boost_trail):
-                opacity = 255 * (1 - i / len(self.boost_trail))  # Fade out effect
-                trail_color = (255, 0, 0, int(opacity))  # Vermelho com opacidade variável
-                trail_surface = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
-                pygame.draw.rect(trail_surface, trail_color, (0, 0, CELL_SIZE, CELL_SIZE))
-                screen.blit(trail_surface, (int(trail_pos.x * CELL_SIZE), int(trail_pos.y * CELL_SIZE)))
-
-        # Desenhar o corpo da nave
-        for i, block in enumerate(self.body):
-            block_rect = pygame.Rect(int(block.x * CELL_SIZE), int(block.y * CELL_SIZE), CELL_SIZE, CELL_SIZE)
-            if i == 0:  # Cabeça da nave
-                pygame.draw.rect(screen, SHIP_COLOR, block_rect)
-                # Desenhar um pequeno triângulo para indicar a direção
-                direction_indicator = [
-                    (block_rect.centerx, block_rect.centery),
-                    (block_rect.centerx + self.direction.x * CELL_SIZE // 2, block_rect.centery + self.direction.y * CELL_SIZE // 2),
-                    (block_rect.centerx - self.direction.y * CELL_SIZE // 4, block_rect.centery + self.direction.x * CELL_SIZE // 4),
-                ]
-                pygame.draw.polygon(screen, STAR_COLOR, direction_indicator)
-            else:
-                pygame.draw.rect(screen, SHIP_COLOR, block_rect, 2)
+            for i, trail_cell in enumerate(self.boost_trail):
+                trail_rect = camera.cell_rect(trail_cell)
+                if trail_rect is None:
+                    continue
+                # Vermelho com opacidade variável, pre-rendered per segment
+                volatile.append(screen.blit(sprites.trail_tile(i, len(self.boost_trail)), trail_rect))
+
+        volatile.append(self.draw_head(screen, camera, sprites, alpha))
+
+        # Only the body segments inside the view are looked up; the head cell
+        # also gets an outline when the ship ran into itself
+        head = self.body[0]
+        grid = self.grid
+        for cell in grid.cells_in(SHIP, *camera.view()):
+            if cell != head or grid.count(SHIP, cell) > 1:
+                pygame.draw.rect(screen, SHIP_COLOR, camera.cell_rect(cell), 2)
+
+        # The trail is drawn with alpha and the interpolated head and its
+        # indicator overlap neighbouring cells, so they are restored every frame
+        return volatile
+
+    def draw_head(self, screen, camera, sprites, alpha=1.0):
+        # Cabeça da nave, with the triangle indicating its direction
+        x, y = camera.offset(*self.head_position(alpha))
+        return screen.blit(sprites.head(self.direction), (int(x * CELL_SIZE), int(y * CELL_SIZE)))
 
     def move(self):
         if self.boost and self.boost_cooldown == 0:
-            move_steps = SPACESHIP_CONFIG['boost_speed_multiplier']
-            self.boost_cooldown = SPACESHIP_CONFIG['boost_cooldown']
+            move_steps = SPACESHIP_CONFIG.boost_speed_multiplier
+            self.boost_cooldown = SPACESHIP_CONFIG.boost_cooldown
         else:
             move_steps = 1
             self.boost = False  # Desativar o boost se o cooldown não for zero
 
         # Atualizar o rastro de boost
         if self.boost:
-            self.boost_trail.insert(0, self.body[-1])  # Adicionar a última posição do corpo ao início do rastro
-            if len(self.boost_trail) > self.trail_length:
-                self.boost_trail.pop()  # Remover o último elemento se o rastro for muito longo
+            self.boost_trail.appendleft(self.body[-1])  # Adicionar a última posição do corpo ao início do rastro
         else:
             self.boost_trail.clear()  # Limpar o rastro quando não estiver em boost
 
+        body = self.body
+        grid = self.grid
+        self.prev_head = body[0]
+        self.last_steps = move_steps
+        dx = int(self.direction.x)
+        dy = int(self.direction.y)
         for _ in range(move_steps):
+            # Wrap around the screen on every step so boosted segments stay on the board
+            y, x = divmod(body[0], CELL_NUMBER)
+            new_head = (y + dy) % CELL_NUMBER * CELL_NUMBER + (x + dx) % CELL_NUMBER
+            # The old head is redrawn as a body segment
+            grid.touch(body[0])
             if self.new_block:
-                body_copy = self.body[:]
-                body_copy.insert(0, body_copy[0] + self.direction)
-                self.body = body_copy[:]
                 self.new_block = False
             else:
-                body_copy = self.body[:-1]
-                body_copy.insert(0, body_copy[0] + self.direction)
-                self.body = body_copy[:]
-
-        # Wrap around the screen
-        self.body[0].x %= CELL_NUMBER
-        self.body[0].y %= CELL_NUMBER
+                grid.remove(SHIP, body.pop_back())
+            body.push_front(new_head)
+            grid.add(SHIP, new_head)
 
         if self.boost_cooldown > 0:
             self.boost_cooldown -= 1
@@ -193,115 +253,176 @@ class Spaceship:
         else:
             self.boost = False
 
+    def head_cell(self):
+        return self.body[0]
+
     def reset(self):
-        self.body = [Vector2(5, 5), Vector2(4, 5), Vector2(3, 5)]
+        for cell in self.body:
+            self.grid.remove(SHIP, cell)
+        self.body = CellRing(self.initial_body())
+        for cell in self.body:
+            self.grid.add(SHIP, cell)
+        self.prev_head = self.body[0]
         self.direction = Vector2(1, 0)
         self.boost = False
         self.boost_cooldown = 0
         self.boost_trail.clear()
 
 class Resource:
-    def __init__(self):
+    def __init__(self, grid):
+        self.grid = grid
+        self.cell = None
         self.randomize()
 
-    def draw(self, screen):
-        resource_rect = pygame.Rect(int(self.pos.x * CELL_SIZE), int(self.pos.y * CELL_SIZE), CELL_SIZE, CELL_SIZE)
-        pygame.draw.rect(screen, RESOURCE_COLOR, resource_rect)
-
     def randomize(self):
-        self.x = random.randint(0, CELL_NUMBER - 1)
-        self.y = random.randint(0, CELL_NUMBER - 1)
+        if self.cell is not None:
+            self.grid.remove(RESOURCE, self.cell)
+        # Spawn only on free cells; a full board leaves no resource
+        self.cell = self.grid.random_free_cell()
+        if self.cell is None:
+            return
+        self.y, self.x = divmod(self.cell, CELL_NUMBER)
         self.pos = Vector2(self.x, self.y)
+        self.grid.add(RESOURCE, self.cell)
 
 class Asteroid:
-    def __init__(self):
+    def __init__(self, grid):
+        self.grid = grid
         self.randomize()
 
-    def draw(self, screen):
-        asteroid_rect = pygame.Rect(int(self.pos.x * CELL_SIZE), int(self.pos.y * CELL_SIZE), CELL_SIZE, CELL_SIZE)
-        pygame.draw.rect(screen, ASTEROID_COLOR, asteroid_rect)
-
     def randomize(self):
-        self.x = random.randint(0, CELL_NUMBER - 1)
-        self.y = random.randint(0, CELL_NUMBER - 1)
+        self.cell = self.grid.random_free_cell()
+        if self.cell is None:
+            return
+        self.y, self.x = divmod(self.cell, CELL_NUMBER)
         self.pos = Vector2(self.x, self.y)
+        self.grid.add(ASTEROID, self.cell)
+
+    def remove(self):
+        if self.cell is not None:
+            self.grid.remove(ASTEROID, self.cell)
 
 class Boss:
-    def __init__(self):
+    def __init__(self, grid):
+        self.grid = grid
         self.pos = Vector2(CELL_NUMBER // 2, 0)  # Start at the top of the screen
-        self.base_size = BOSS_CONFIG['base_size']
+        self.prev_x = self.pos.x
+        self.base_size = BOSS_CONFIG.base_size
         self.movement_timer = 0
-        self.movement_interval = BOSS_CONFIG['movement_interval']
+        self.movement_interval = BOSS_CONFIG.movement_interval
         self.attack_timer = 0
-        self.attack_interval = BOSS_CONFIG['attack_interval']
-        self.projectiles = []
+        self.attack_interval = BOSS_CONFIG.attack_interval
+        # Velocities of one attack, the same on every attack
+        self.volley = pattern_velocities(BOSS_CONFIG.attack_pattern, BOSS_CONFIG.projectiles_per_attack,
+                                         BOSS_CONFIG.projectile_speed)
+        self.projectiles = projectile_buffer(grid)
         self.wobble_offset = 0
-        self.wobble_speed = BOSS_CONFIG['wobble_speed']
-        self.points_needed = 5  # Points needed to defeat the boss
+        self.wobble_speed = BOSS_CONFIG.wobble_speed
+        self.points_needed = BOSS_POINTS_NEEDED
+        self.occupy()
+
+    def cells(self):
+        first = self.grid.cell(self.pos.x, self.pos.y)
+        for dy in range(self.base_size):
+            row = first + dy * CELL_NUMBER
+            for dx in range(self.base_size):
+                yield row + dx
+
+    def occupy(self):
+        for cell in self.cells():
+            self.grid.add(BOSS, cell)
+
+    def vacate(self):
+        for cell in self.cells():
+            self.grid.remove(BOSS, cell)
+
+    def draw(self, screen, camera, sprites, alpha=1.0):
+        """Draw the boss and return its rect, or None when it is off the view."""
+        pos_x, pos_y = camera.offset(self.prev_x + (self.pos.x - self.prev_x) * alpha, self.pos.y)
+        # The wobble reaches a little past the base square
+        if not camera.visible(pos_x, pos_y, self.base_size + 1):
+            return None
+
+        # The wobble is interpolated between the last two ticks, like the position
+        sprite = sprites.boss_frame(self.wobble_offset + (alpha - 1) * self.wobble_speed)
+        center = (round((pos_x + self.base_size / 2) * CELL_SIZE), round((pos_y + self.base_size / 2) * CELL_SIZE))
+        return screen.blit(sprite, sprite.get_rect(center=center))
 
-    def draw(self, screen):
+    def update(self):
         self.wobble_offset += self.wobble_speed
-        
-        points = []
-        for i in range(16):
-            angle = i * (2 * math.pi / 16)
-            wobble = math.sin(angle * 4 + self.wobble_offset) * BOSS_CONFIG['wobble_amplitude']
-            radius = (self.base_size / 2 + wobble) * CELL_SIZE
-            x = self.pos.x * CELL_SIZE + self.base_size * CELL_SIZE / 2 + math.cos(angle) * radius
-            y = self.pos.y * CELL_SIZE + self.base_size * CELL_SIZE / 2 + math.sin(angle) * radius
-            points.append((x, y))
-
-        pygame.draw.polygon(screen, BOSS_COLOR, points)
+        self.move()
+        self.attack()
+        self.update_projectiles()
 
     def move(self):
+        self.prev_x = self.pos.x
         self.movement_timer += 1
         if self.movement_timer >= self.movement_interval:
-            self.pos.x += random.choice([-1, 0, 1])
+            self.vacate()
+            self.pos.x += self.grid.rng.choice([-1, 0, 1])
             self.pos.x = max(0, min(CELL_NUMBER - self.base_size, self.pos.x))
+            self.occupy()
             self.movement_timer = 0
 
     def attack(self):
         self.attack_timer += 1
         if self.attack_timer >= self.attack_interval:
-            projectile_pos = Vector2(
-                self.pos.x + self.base_size // 2,
-                self.pos.y + self.base_size
-            )
-            self.projectiles.append(projectile_pos)
+            # A ring is fired from the centre of the boss, the rest from below it
+            below = self.base_size // 2 if BOSS_CONFIG.attack_pattern == 'ring' else self.base_size
+            self.projectiles.spawn(self.pos.x + self.base_size // 2, self.pos.y + below, self.volley)
             self.attack_timer = 0
 
     def update_projectiles(self):
-        for projectile in self.projectiles[:]:
-            projectile.y += BOSS_CONFIG['projectile_speed']
-            if projectile.y >= CELL_NUMBER:
-                self.projectiles.remove(projectile)
+        # Moves all projectiles and drops those that left the board
+        self.projectiles.step()
+
+    def remove(self):
+        self.vacate()
+        self.projectiles.clear()
 
-    def draw_projectiles(self, screen):
-        for projectile in self.projectiles:
+    def draw_projectiles(self, screen, camera, alpha=1.0):
+        rects = []
+        # Projectiles are drawn where they were alpha into the last tick
+        for x, y in self.projectiles.visible(camera, alpha):
             projectile_rect = pygame.Rect(
-                int(projectile.x * CELL_SIZE),
-                int(projectile.y * CELL_SIZE),
+                int(x * CELL_SIZE),
+                int(y * CELL_SIZE),
                 CELL_SIZE,
                 CELL_SIZE
             )
-            pygame.draw.rect(screen, BOSS_PROJECTILE_COLOR, projectile_rect)
+            rects.append(pygame.draw.rect(screen, BOSS_PROJECTILE_COLOR, projectile_rect))
+        return rects
 
 class Game:
-    def __init__(self, input_handler):
-        self.spaceship = Spaceship()
-        self.resource = Resource()
-        self.asteroids = [Asteroid() for _ in range(GAME_SETTINGS['initial_asteroids'])]
+    def __init__(self, input_handler, headless=False, seed=None, rng=None):
+        # Headless games never touch the display, fonts or the high score file
+        self.headless = headless
+        # Every random choice of the simulation comes from this seed, so a
+        # game is reproducible from it plus the inputs of each tick. rng
+        # replaces that generator, e.g. a batch.SplitMix64 to follow a BatchEnv game
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.rng = random.Random(self.seed) if rng is None else rng
+        self.tick = 0
+        self.grid = OccupancyGrid(CELL_NUMBER, self.rng)
+        self.spaceship = Spaceship(self.grid)
+        self.resource = Resource(self.grid)
+        self.asteroids = [Asteroid(self.grid) for _ in range(GAME_SETTINGS.initial_asteroids)]
         self.input_handler = input_handler
         self.score = 0
         self.state = GameState.MENU
-        self.high_score = self.load_high_score()
-        self.stars = self.generate_stars()
-        self.fps = GAME_SETTINGS['fps']
+        self.high_score = 0 if headless else self.load_high_score()
+        # The stars draw from their own generator so rendering never shifts the simulation
+        self.stars = [] if headless else self.generate_stars(random.Random(self.seed))
+        self.text = TextCache()
+        self.renderer = None
+        self.sprites = None
+        self.camera = Camera(CELL_NUMBER, VIEW_CELLS, CELL_SIZE)
+        self.fps = GAME_SETTINGS.fps
         self.boss = None
-        self.boss_spawn_score = BOSS_CONFIG['spawn_score']
-        self.fps_increase_rate = GAME_SETTINGS['fps_increase_rate']
+        self.boss_spawn_score = BOSS_CONFIG.spawn_score
+        self.fps_increase_rate = GAME_SETTINGS.fps_increase_rate
         self.boss_spawn_timer = 0
-        self.boss_spawn_delay = BOSS_CONFIG['spawn_delay']
+        self.boss_spawn_delay = BOSS_CONFIG.spawn_delay
         self.boss_points_collected = 0  # New attribute to track points collected during boss fight
         self.boss = None
 
@@ -320,18 +441,16 @@ class Game:
             # Boss logic
             if self.score >= self.boss_spawn_score and self.boss is None:
                 if self.boss_spawn_timer == 0:
-                    print("Boss spawning soon!")  # Debug message
+                    self.log("Boss spawning soon!")
                 self.boss_spawn_timer += 1
                 if self.boss_spawn_timer >= self.boss_spawn_delay:
-                    self.boss = Boss()
-                    print(f"Boss spawned at {self.boss.pos}")  # Debug message
+                    self.boss = Boss(self.grid)
+                    self.log(f"Boss spawned at {self.boss.pos}")
                     self.boss_spawn_timer = 0
                     self.boss_points_collected = 0  # Reset points collected when boss spawns
             
             if self.boss:
-                self.boss.move()
-                self.boss.attack()
-                self.boss.update_projectiles()
+                self.boss.update()
                 self.check_boss_collision()
 
         elif self.state == GameState.MENU or self.state == GameState.GAME_OVER:
@@ -339,36 +458,134 @@ class Game:
             if action == "START":
                 self.start_game()
 
-    def draw(self, screen):
-        self.draw_space(screen)
-        self.spaceship.draw(screen)
-        self.resource.draw(screen)
-        for asteroid in self.asteroids:
-            asteroid.draw(screen)
+        self.tick += 1
+
+    def step(self, n_ticks=1, inputs=None):
+        """Advance the simulation n_ticks without rendering.
+
+        inputs is an optional iterable yielding one (direction, action) pair
+        per tick, either of which may be None. It requires a ScriptedInput.
+        """
+        inputs = iter(inputs) if inputs is not None else None
+        for _ in range(n_ticks):
+            if inputs is not None:
+                direction, action = next(inputs, (None, None))
+                self.input_handler.push(direction, action)
+            self.update()
+
+    def log(self, message):
+        if not self.headless:
+            print(message)  # Debug message
+
+    def state_hash(self):
+        """Digest of the simulation state, for checking that replays match."""
+        digest = hashlib.blake2b(digest_size=16)
+        for layer in self.grid.layers:
+            digest.update(layer.tobytes())
+        ship = self.spaceship
+        boss = self.boss
+        state = (
+            self.tick, self.state.name, self.score, self.fps, self.boss_spawn_score,
+            self.boss_spawn_timer, self.boss_points_collected,
+            list(ship.body), tuple(ship.direction), ship.boost, ship.boost_cooldown, ship.new_block,
+            self.resource.cell, [asteroid.cell for asteroid in self.asteroids],
+            None if boss is None else (tuple(boss.pos), boss.movement_timer, boss.attack_timer,
+                                       boss.projectiles.positions()),
+        )
+        digest.update(repr(state).encode())
+        return digest.hexdigest()
+
+    def draw(self, screen, alpha=1.0, overlay=None):
+        """Draw a frame and return the rects to pass to pygame.display.update.
+
+        alpha is how far the render time lies between the last two ticks.
+        overlay(screen, text) may draw on top and return the rects it covered.
+        """
+        if self.state != GameState.PLAYING:
+            alpha = 1.0
+        if self.renderer is None:
+            self.renderer = self.create_renderer(screen)
+            self.grid.changed = set()
+        if self.sprites is None:
+            self.sprites = self.create_sprites()
+        camera = self.camera
+        # The camera moves by whole cells, and every cell on screen with it
+        if camera.follow(*divmod(self.spaceship.head_cell(), CELL_NUMBER)[::-1]):
+            self.renderer.invalidate()
+        # Changes outside the view have nothing on screen to restore
+        changed = [rect for rect in map(camera.cell_rect, self.grid.take_changed()) if rect]
+        self.renderer.clear(screen, changed)
+
+        # Grid entities are restored through the changed cells; everything
+        # collected in volatile is redrawn and restored every frame
+        cell_array = isinstance(self.renderer, CellArrayRenderer)
+        if cell_array:
+            volatile = self.draw_cell_array(screen, alpha)
+        else:
+            volatile = self.spaceship.draw(screen, camera, self.sprites, alpha)
+            self.draw_cells(screen, RESOURCE, RESOURCE_COLOR)
+            self.draw_cells(screen, ASTEROID, ASTEROID_COLOR)
         if self.boss:
-            self.boss.draw(screen)
-            self.boss.draw_projectiles(screen)
-        self.draw_score(screen)
-        self.draw_boost_cooldown(screen)
+            boss_rect = self.boss.draw(screen, camera, self.sprites, alpha)
+            if boss_rect:
+                volatile.append(boss_rect)
+            # The cell array already holds the projectiles, snapped to their cells
+            if not cell_array:
+                volatile.extend(self.boss.draw_projectiles(screen, camera, alpha))
+        volatile.append(self.draw_score(screen))
+        volatile.extend(self.draw_boost_cooldown(screen))
         
         # Draw boss spawn warning
         if self.boss_spawn_timer > 0:
             warning_text = "BOSS INCOMING!"
-            warning_surface = pygame.font.Font(None, 48).render(warning_text, True, (255, 0, 0))
+            warning_surface = self.text.render(warning_text, 48, (255, 0, 0))
             warning_rect = warning_surface.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 4))
-            screen.blit(warning_surface, warning_rect)
+            volatile.append(screen.blit(warning_surface, warning_rect))
         
         # Draw boss points needed
         if self.boss:
             boss_info_text = f"Boss Fight: Points {self.boss_points_collected}/{self.boss.points_needed}"
-            boss_info_surface = pygame.font.Font(None, 24).render(boss_info_text, True, STAR_COLOR)
+            boss_info_surface = self.text.render(boss_info_text, 24, STAR_COLOR)
             boss_info_rect = boss_info_surface.get_rect(topleft=(20, 60))
-            screen.blit(boss_info_surface, boss_info_rect)
+            volatile.append(screen.blit(boss_info_surface, boss_info_rect))
         
         if self.state == GameState.MENU:
-            self.draw_menu(screen)
+            volatile.extend(self.draw_menu(screen))
         elif self.state == GameState.GAME_OVER:
-            self.draw_game_over(screen)
+            volatile.extend(self.draw_game_over(screen))
+
+        if overlay is not None:
+            volatile.extend(overlay(screen, self.text))
+
+        return self.renderer.collect(screen, volatile)
+
+    def draw_cells(self, screen, kind, color):
+        # Only the cells inside the view are looked up, whatever the world size
+        camera = self.camera
+        for cell in self.grid.cells_in(kind, *camera.view()):
+            pygame.draw.rect(screen, color, camera.cell_rect(cell))
+
+    def draw_cell_array(self, screen, alpha):
+        renderer = self.renderer
+        camera = self.camera
+        ship = self.spaceship
+        cells = renderer.paint(self.grid, camera, ((SHIP, SHIP_COLOR), (RESOURCE, RESOURCE_COLOR),
+                                                   (ASTEROID, ASTEROID_COLOR), (PROJECTILE, BOSS_PROJECTILE_COLOR)))
+        # The head is drawn interpolated on top, so its cell stays empty
+        # unless the ship ran into itself or something else is there
+        head = ship.head_cell()
+        x, y = camera.offset(*divmod(head, CELL_NUMBER)[::-1])
+        if self.grid.count(SHIP, head) == 1 and tuple(cells[x, y]) == SHIP_COLOR:
+            cells[x, y] = renderer.key
+        # The trail fades out over the empty cells the tail left behind
+        if ship.boost:
+            for i, cell in enumerate(ship.boost_trail):
+                x, y = camera.offset(*divmod(cell, CELL_NUMBER)[::-1])
+                if camera.visible(x, y) and tuple(cells[x, y]) == renderer.key:
+                    opacity = 1 - i / len(ship.boost_trail)
+                    cells[x, y] = [round(red * opacity + space * (1 - opacity)) for red, space in zip((255, 0, 0), SPACE_COLOR)]
+        renderer.render(screen)
+        return [ship.draw_head(screen, camera, self.sprites, alpha)]
 
     def draw_boost_cooldown(self, screen):
         cooldown_width = 100
@@ -377,137 +594,192 @@ class Game:
         cooldown_y = 50
 
         # Desenhar o fundo do indicador de cooldown
-        pygame.draw.rect(screen, (100, 100, 100), (cooldown_x, cooldown_y, cooldown_width, cooldown_height))
+        bar_rect = pygame.draw.rect(screen, (100, 100, 100), (cooldown_x, cooldown_y, cooldown_width, cooldown_height))
 
         # Calcular o preenchimento do cooldown
         if self.spaceship.boost_cooldown > 0:
-            fill_width = (1 - self.spaceship.boost_cooldown / SPACESHIP_CONFIG['boost_cooldown']) * cooldown_width
+            fill_width = (1 - self.spaceship.boost_cooldown / SPACESHIP_CONFIG.boost_cooldown) * cooldown_width
             pygame.draw.rect(screen, (0, 255, 0), (cooldown_x, cooldown_y, fill_width, cooldown_height))
         else:
             pygame.draw.rect(screen, (0, 255, 0), (cooldown_x, cooldown_y, cooldown_width, cooldown_height))
 
         # Desenhar o texto "BOOST"
-        boost_text = pygame.font.Font(None, 24).render("BOOST", True, STAR_COLOR)
+        boost_text = self.text.render("BOOST", 24, STAR_COLOR)
         boost_text_rect = boost_text.get_rect(midright=(cooldown_x - 10, cooldown_y + cooldown_height // 2))
-        screen.blit(boost_text, boost_text_rect)
+        return [bar_rect, screen.blit(boost_text, boost_text_rect)]
 
     def check_collision(self):
-        if self.resource.pos == self.spaceship.body[0]:
+        if self.grid.count(RESOURCE, self.spaceship.head_cell()):
             self.resource.randomize()
             self.spaceship.add_block()
-            self.score += SCORING['resource_points']
+            self.score += SCORING.resource_points
             if self.boss:
                 self.boss_points_collected += 1
                 if self.boss_points_collected >= self.boss.points_needed:
                     self.defeat_boss()
             self.fps += self.fps_increase_rate
-            if self.score % GAME_SETTINGS['asteroids_increase_interval'] == 0:
-                self.asteroids.append(Asteroid())
+            if self.score % GAME_SETTINGS.asteroids_increase_interval == 0:
+                self.asteroids.append(Asteroid(self.grid))
 
     def check_boss_collision(self):
         if self.boss:
-            # Check if spaceship hits boss
-            for segment in self.spaceship.body:
-                if (self.boss.pos.x <= segment.x < self.boss.pos.x + self.boss.base_size and
-                    self.boss.pos.y <= segment.y < self.boss.pos.y + self.boss.base_size):
-                    print(f"Collision detected! Segment: {segment}")  # Debug message
+            # Check if any spaceship segment lies inside the boss area
+            ship_layer = self.grid.layers[SHIP]
+            for cell in self.boss.cells():
+                if ship_layer[cell]:
+                    self.log(f"Collision detected! Segment: {divmod(cell, CELL_NUMBER)[::-1]}")
                     self.game_over()
                     return
 
             # Check if spaceship hits boss projectiles
-            for projectile in self.boss.projectiles:
-                if (int(projectile.x) == int(self.spaceship.body[0].x) and 
-                    int(projectile.y) == int(self.spaceship.body[0].y)):
-                    print(f"Projectile hit! Projectile: {projectile}")  # Debug message
-                    self.game_over()
-                    return
+            head = self.spaceship.head_cell()
+            if self.grid.count(PROJECTILE, head):
+                self.log(f"Projectile hit! Projectile: {divmod(head, CELL_NUMBER)[::-1]}")
+                self.game_over()
+                return
 
     def defeat_boss(self):
-        self.score += SCORING['boss_defeat_bonus']
+        self.score += SCORING.boss_defeat_bonus
+        self.boss.remove()
         self.boss = None
-        self.boss_spawn_score += SCORING['boss_spawn_score_increase']
+        self.boss_spawn_score += SCORING.boss_spawn_score_increase
         self.boss_points_collected = 0  # Reset points for next boss
-        print(f"Boss defeated! New score: {self.score}")  # Debug message
+        self.log(f"Boss defeated! New score: {self.score}")
     
     def check_fail(self):
-        head = self.spaceship.body[0]
-        for block in self.spaceship.body[1:]:
-            if block == head:
-                self.game_over()
-        for asteroid in self.asteroids:
-            if asteroid.pos == head:
-                self.game_over()
+        head = self.spaceship.head_cell()
+        # The head itself accounts for one ship count on its cell
+        if self.grid.count(SHIP, head) > 1 or self.grid.count(ASTEROID, head):
+            self.game_over()
 
     def game_over(self):
         self.state = GameState.GAME_OVER
         if self.score > self.high_score:
             self.high_score = self.score
-            self.save_high_score()
+            if not self.headless:
+                self.save_high_score()
 
     def start_game(self):
         self.spaceship.reset()
         self.score = 0
-        self.asteroids = [Asteroid() for _ in range(GAME_SETTINGS['initial_asteroids'])]
+        for asteroid in self.asteroids:
+            asteroid.remove()
+        self.asteroids = [Asteroid(self.grid) for _ in range(GAME_SETTINGS.initial_asteroids)]
         self.state = GameState.PLAYING
-        self.fps = GAME_SETTINGS['fps']
+        self.fps = GAME_SETTINGS.fps
+        if self.boss:
+            self.boss.remove()
         self.boss = None
 
 
-    def generate_stars(self):
-        return [(random.randint(0, SCREEN_SIZE), random.randint(0, SCREEN_SIZE)) for _ in range(100)]
+    def generate_stars(self, rng):
+        return [(rng.randint(0, SCREEN_SIZE), rng.randint(0, SCREEN_SIZE)) for _ in range(100)]
 
     def draw_space(self, screen):
         screen.fill(SPACE_COLOR)
         for star in self.stars:
             pygame.draw.circle(screen, STAR_COLOR, star, 1)
 
+    def prewarm(self, screen):
+        """Bake the background and sprites and render the fixed texts before the first frame."""
+        self.renderer = self.create_renderer(screen)
+        self.grid.changed = set()
+        self.sprites = self.create_sprites()
+        for text, size in (("Space Snake", 72), ("Press Enter to Start", 36), ("Game Over", 72),
+                           ("Press Enter to Restart", 36), ("BOOST", 24), ("Score: 0", 36),
+                           (f"High Score: {self.high_score}", 36)):
+            self.text.render(text, size, STAR_COLOR)
+        self.text.render("BOSS INCOMING!", 48, (255, 0, 0))
+
+    def create_sprites(self):
+        return SpriteCache(CELL_SIZE, BOSS_CONFIG.base_size, BOSS_CONFIG.wobble_amplitude,
+                           self.spaceship.trail_length, SHIP_COLOR, STAR_COLOR, BOSS_COLOR)
+
+    def create_renderer(self, screen):
+        background = self.render_background(screen)
+        if GAME_SETTINGS.renderer == 'array':
+            if np is not None:
+                return CellArrayRenderer(background, VIEW_CELLS)
+            self.log("The array renderer needs NumPy; drawing rects instead")
+        return DirtyRectRenderer(background)
+
+    def render_background(self, screen):
+        # The starfield never changes, so it is baked once and blitted from then on
+        background = pygame.Surface(screen.get_size()).convert()
+        self.draw_space(background)
+        return background
+
     def draw_score(self, screen):
         score_text = f"Score: {self.score}"
-        score_surface = pygame.font.Font(None, 36).render(score_text, True, STAR_COLOR)
+        score_surface = self.text.render(score_text, 36, STAR_COLOR)
         score_rect = score_surface.get_rect(topleft=(20, 20))
-        screen.blit(score_surface, score_rect)
+        return screen.blit(score_surface, score_rect)
+
+    def display_values(self):
+        """Values for the board's left and right 7-segment displays."""
+        # While a boss is alive the right display counts the points still needed
+        if self.boss:
+            return self.score, self.boss.points_needed - self.boss_points_collected
+        return self.score, self.high_score
 
     def draw_menu(self, screen):
-        title_surface = pygame.font.Font(None, 72).render("Space Snake", True, STAR_COLOR)
+        rects = []
+        title_surface = self.text.render("Space Snake", 72, STAR_COLOR)
         title_rect = title_surface.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 3))
-        screen.blit(title_surface, title_rect)
+        rects.append(screen.blit(title_surface, title_rect))
 
-        start_surface = pygame.font.Font(None, 36).render("Press Enter to Start", True, STAR_COLOR)
+        start_surface = self.text.render("Press Enter to Start", 36, STAR_COLOR)
         start_rect = start_surface.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE * 2 // 3))
-        screen.blit(start_surface, start_rect)
+        rects.append(screen.blit(start_surface, start_rect))
+        return rects
 
     def draw_game_over(self, screen):
-        game_over_surface = pygame.font.Font(None, 72).render("Game Over", True, STAR_COLOR)
+        rects = []
+        game_over_surface = self.text.render("Game Over", 72, STAR_COLOR)
         game_over_rect = game_over_surface.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 3))
-        screen.blit(game_over_surface, game_over_rect)
+        rects.append(screen.blit(game_over_surface, game_over_rect))
 
-        score_surface = pygame.font.Font(None, 36).render(f"Score: {self.score}", True, STAR_COLOR)
+        score_surface = self.text.render(f"Score: {self.score}", 36, STAR_COLOR)
         score_rect = score_surface.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 2))
-        screen.blit(score_surface, score_rect)
+        rects.append(screen.blit(score_surface, score_rect))
 
-        high_score_surface = pygame.font.Font(None, 36).render(f"High Score: {self.high_score}", True, STAR_COLOR)
+        high_score_surface = self.text.render(f"High Score: {self.high_score}", 36, STAR_COLOR)
         high_score_rect = high_score_surface.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 2 + 40))
-        screen.blit(high_score_surface, high_score_rect)
+        rects.append(screen.blit(high_score_surface, high_score_rect))
 
-        restart_surface = pygame.font.Font(None, 36).render("Press Enter to Restart", True, STAR_COLOR)
+        restart_surface = self.text.render("Press Enter to Restart", 36, STAR_COLOR)
         restart_rect = restart_surface.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE * 2 // 3))
-        screen.blit(restart_surface, restart_rect)
+        rects.append(screen.blit(restart_surface, restart_rect))
+        return rects
 
     def load_high_score(self):
         try:
-            with open('high_score.txt', 'r') as f:
+            with open(HIGH_SCORE_PATH, 'r') as f:
                 return int(f.read())
         except FileNotFoundError:
             return 0
 
     def save_high_score(self):
-        with open('high_score.txt', 'w') as f:
+        with open(HIGH_SCORE_PATH, 'w') as f:
             f.write(str(self.high_score))
 
 def main():
     # Change this line to switch between keyboard and external control
     USE_KEYBOARD = True
-
+    # Wait on driver change events instead of sampling buttons on a thread.
+    # Needs a driver that queues every change; the poller works with any
+    USE_DEVICE_EVENTS = False
+    # Share the board with other front-ends through a running broker.py
+    USE_BROKER = False
+    # Time every frame phase; F3 shows the overlay, the samples are dumped on exit
+    PROFILE = False
+    PROFILE_DUMP = FRAME_PROFILE_PATH
+    # Inputs of the session are recorded here for replay.py (None disables)
+    RECORD_PATH = LAST_GAME_PATH
+
+    # Only the subsystems the game uses; pygame.init() would also start audio and joysticks
+    pygame.display.init()
+    pygame.font.init()
     screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
     pygame.display.set_caption('Space Snake')
     clock = pygame.time.Clock()
@@ -515,30 +787,106 @@ def main():
     if USE_KEYBOARD:
         input_handler = KeyboardInput()
     else:
-        from constants import PATH
-        fd = os.open(PATH, os.O_RDWR)
-        input_handler = ExternalControlInput(fd)
+        from constants import WR_GREEN_LEDS, WR_RED_LEDS
+        from hal import DeviceHAL, open_device
+        from animation import Animator, GREEN_BLINK, RED_INVERSE_SWEEP
+        from scoreboard import Scoreboard
+        if USE_BROKER:
+            from broker import BrokerBackend
+            hal = DeviceHAL(BrokerBackend())
+        else:
+            # The board by default; DE2I_BACKEND=fake plays without it
+            hal = DeviceHAL(open_device())
+        source = None
+        if USE_DEVICE_EVENTS:
+            try:
+                source = hal.backend.events()
+            except NotImplementedError:
+                # The broker does not forward events; its clients poll
+                pass
+        if source is None:
+            from poller import ButtonPoller
+            source = ButtonPoller(hal.read_buttons)
+            source.start()
+        input_handler = ExternalControlInput(source)
+        # The scoreboard thread does every device write; the others only stage
+        scoreboard = Scoreboard(hal)
+        scoreboard.start()
+        animator = Animator(hal, scoreboard=scoreboard)
+        animator.start()
         print('File opened successfully!')
 
-    game = Game(input_handler)
+    if RECORD_PATH:
+        from replay import RecordingInput
+        recorder = RecordingInput(input_handler, RECORD_PATH)
+        game = Game(recorder)
+        recorder.start(game)
+    else:
+        game = Game(input_handler)
+    game.prewarm(screen)
+    timestep = FixedTimestep()
+    frame_budget = 1 / RENDER_FPS
+    profiler = FrameProfiler(frame_budget) if PROFILE else NullProfiler()
+    last_time = time.perf_counter()
 
     try:
         while True:
+            profiler.begin_frame()
             events = pygame.event.get()
             for event in events:
                 if event.type == pygame.QUIT:
                     return
-
-            input_handler.process_events(events)
-            game.update()
-            game.draw(screen)
-            pygame.display.update()
-            clock.tick(game.fps)  # Use the game's current FPS
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    profiler.toggle()
+
+            # Input and rendering run at RENDER_FPS; the simulation ticks at game.fps
+            game.input_handler.process_events(events)
+            profiler.mark('input')
+            now = time.perf_counter()
+            tick_interval = 1 / game.fps
+            score, state = game.score, game.state
+            for _ in range(timestep.advance(now - last_time, tick_interval, frame_budget)):
+                game.update()
+            last_time = now
+            profiler.mark('update')
+
+            rects = game.draw(screen, timestep.alpha(tick_interval), profiler.draw if profiler.visible else None)
+            profiler.mark('draw')
+            pygame.display.update(rects)
+            profiler.mark('display')
+            if timestep.frames == 1:
+                print(f'Time to first frame: {(time.perf_counter() - IMPORT_STARTED) * 1000:.1f} ms')
+            if not USE_KEYBOARD:
+                # The animator thread plays these while the game keeps running
+                if game.state == GameState.PLAYING and game.score > score:
+                    animator.play(WR_GREEN_LEDS, GREEN_BLINK, step=0.05)
+                if game.state == GameState.GAME_OVER and state != GameState.GAME_OVER:
+                    animator.play(WR_RED_LEDS, RED_INVERSE_SWEEP)
+                scoreboard.show(*game.display_values())
+            profiler.mark('device')
+            profiler.end_frame()
+            clock.tick(RENDER_FPS)
 
     finally:
+        print(f'Timestep: {timestep.stats()}')
+        print(f'Text cache: {game.text.stats()}')
+        print(f'Sprite cache: {game.sprites.memory()} bytes')
+        if PROFILE:
+            print(f'Frame profile: {profiler.summary()}')
+            profiler.dump(PROFILE_DUMP)
         pygame.quit()
+        if RECORD_PATH:
+            recorder.close()
+            print(f'Inputs recorded to {RECORD_PATH} (seed {game.seed}, {game.tick} ticks)')
         if not USE_KEYBOARD:
-            os.close(fd)
+            input_handler.close()
+            animator.stop()
+            scoreboard.stop()
+            print(f'Animator: {animator.stats()}')
+            print(f'Scoreboard: {scoreboard.stats()}')
+            print(f'Input source: {input_handler.source.stats()}')
+            print(f'Device: {hal.stats()}')
+            hal.backend.close()
             print('File closed successfully!')
 
 if __name__ == "__main__":
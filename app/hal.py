@@ -0,0 +1,175 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from fcntl import ioctl
+from utils import transfer
+from constants import PATH, RD_SWITCHES, RD_PBUTTONS, WR_L_DISPLAY, WR_R_DISPLAY, WR_RED_LEDS, WR_GREEN_LEDS, BUTTON_NAMES
+
+class DeviceBackend(ABC):
+    """Register access to the board.
+
+    Registers are the WR_*/RD_* ioctl commands and values are u32. syscalls
+    counts the system calls (or their modelled equivalent) issued so far.
+    """
+
+    syscalls = 0
+
+    @abstractmethod
+    def read(self, register):
+        pass
+
+    @abstractmethod
+    def write(self, register, value):
+        pass
+
+    def transfer(self, writes, reads):
+        """Write (register, value) pairs, then read registers; returns the values read."""
+        for register, value in writes:
+            self.write(register, value)
+        return [self.read(register) for register in reads]
+
+    def read_buttons(self):
+        return self.read(RD_PBUTTONS)
+
+    def events(self):
+        """DeviceEvents delivering switch/button changes."""
+        from events import DeviceEvents
+        # Events mode is per open file, so it gets its own descriptor
+        return DeviceEvents(os.open(PATH, os.O_RDWR))
+
+    def close(self):
+        pass
+
+class IoctlBackend(DeviceBackend):
+    """Register access through the driver's ioctl select + read/write pair."""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.syscalls = 0
+
+    def read(self, register):
+        ioctl(self.fd, register)
+        data = os.read(self.fd, 4)
+        self.syscalls += 2
+        return int.from_bytes(data, 'little')
+
+    def write(self, register, value):
+        ioctl(self.fd, register)
+        os.write(self.fd, value.to_bytes(4, 'little'))
+        self.syscalls += 2
+
+    def transfer(self, writes, reads):
+        self.syscalls += 1
+        return transfer(self.fd, writes, reads)
+
+    def close(self):
+        os.close(self.fd)
+
+def open_device(path=PATH):
+    """Open the backend named by $DE2I_BACKEND: auto (default), mmap, ioctl or fake.
+
+    The fake device takes its per-syscall latency from $DE2I_FAKE_LATENCY,
+    either a preset name from fake_device.LATENCY_PRESETS or seconds.
+    """
+    kind = os.environ.get('DE2I_BACKEND', 'auto')
+    if kind == 'fake':
+        from fake_device import FakeDevice, LATENCY_PRESETS
+        latency = os.environ.get('DE2I_FAKE_LATENCY', 'none')
+        return FakeDevice(LATENCY_PRESETS[latency] if latency in LATENCY_PRESETS else float(latency))
+    if kind not in ('auto', 'mmap', 'ioctl'):
+        raise ValueError(f'unknown DE2I_BACKEND: {kind}')
+
+    fd = os.open(path, os.O_RDWR)
+    if kind == 'ioctl':
+        return IoctlBackend(fd)
+    from mmio import MmapBackend
+    try:
+        backend = MmapBackend(fd)
+    except (OSError, ValueError):
+        if kind == 'mmap':
+            os.close(fd)
+            raise
+        return IoctlBackend(fd)
+    # The mapping stays valid without the descriptor
+    os.close(fd)
+    return backend
+
+class DeviceHAL:
+    """Shadow copies of the board outputs with write coalescing.
+
+    Setters only update the shadow registers; flush() writes each register
+    whose value actually changed, once per frame, in one batched transfer
+    together with any reads requested. Reads return integer masks.
+    The backend is shared with the input poller and animator threads, so
+    setters and backend access are locked.
+    """
+
+    OUTPUTS = (WR_RED_LEDS, WR_GREEN_LEDS, WR_L_DISPLAY, WR_R_DISPLAY)
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        # None means the hardware value is unknown, so the first write always goes out
+        self.shadow = dict.fromkeys(self.OUTPUTS)
+        self.pending = {}
+        self.skipped_writes = 0
+        self.frame_start = backend.syscalls
+        self.last_frame_syscalls = 0
+
+    def set(self, register, value):
+        with self.lock:
+            if self.shadow[register] == value:
+                if self.pending.pop(register, None) is None:
+                    self.skipped_writes += 1
+            else:
+                self.pending[register] = value
+
+    def set_red_leds(self, mask):
+        self.set(WR_RED_LEDS, mask)
+
+    def set_green_leds(self, mask):
+        self.set(WR_GREEN_LEDS, mask)
+
+    def set_left_display(self, value):
+        self.set(WR_L_DISPLAY, value)
+
+    def set_right_display(self, value):
+        self.set(WR_R_DISPLAY, value)
+
+    def flush(self, reads=()):
+        """Write the changed registers and read the given ones in one transfer."""
+        with self.lock:
+            if not self.pending and not reads:
+                return []
+            values = self.backend.transfer(list(self.pending.items()), list(reads))
+            self.shadow.update(self.pending)
+            self.pending.clear()
+        return values
+
+    def read(self, register):
+        with self.lock:
+            return self.backend.read(register)
+
+    def read_buttons(self):
+        return self.read(RD_PBUTTONS)
+
+    def read_switches(self):
+        return self.read(RD_SWITCHES)
+
+    def button_name(self, mask):
+        return BUTTON_NAMES[mask & 0b1111]
+
+    def end_frame(self, reads=()):
+        """Flush pending writes and record the syscalls issued during the frame."""
+        values = self.flush(reads)
+        syscalls = self.backend.syscalls
+        self.last_frame_syscalls = syscalls - self.frame_start
+        self.frame_start = syscalls
+        return values
+
+    def stats(self):
+        return {
+            'syscalls': self.backend.syscalls,
+            'last_frame_syscalls': self.last_frame_syscalls,
+            'skipped_writes': self.skipped_writes,
+        }
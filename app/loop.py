@@ -0,0 +1,47 @@
+class FixedTimestep:
+    """Accumulator that runs simulation ticks at a fixed rate, independent of rendering.
+
+    Each rendered frame feeds its duration in; advance() returns how many
+    ticks to simulate and alpha() how far the frame lies between two ticks.
+    """
+
+    def __init__(self, max_ticks_per_frame=5):
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.accumulator = 0.0
+        self.frames = 0
+        self.ticks = 0
+        self.missed_frames = 0   # Frames that took longer than the render budget
+        self.catch_up_ticks = 0  # Ticks beyond the first simulated in one frame
+        self.dropped_time = 0.0  # Seconds discarded after exceeding max_ticks_per_frame
+
+    def advance(self, frame_time, tick_interval, frame_budget):
+        self.frames += 1
+        if frame_time > frame_budget:
+            self.missed_frames += 1
+
+        self.accumulator += frame_time
+        ticks = int(self.accumulator // tick_interval)
+        # Give up on time we cannot catch up with instead of spiralling
+        if ticks > self.max_ticks_per_frame:
+            skipped = ticks - self.max_ticks_per_frame
+            self.dropped_time += skipped * tick_interval
+            self.accumulator -= skipped * tick_interval
+            ticks = self.max_ticks_per_frame
+        if ticks > 1:
+            self.catch_up_ticks += ticks - 1
+
+        self.accumulator -= ticks * tick_interval
+        self.ticks += ticks
+        return ticks
+
+    def alpha(self, tick_interval):
+        return min(1.0, self.accumulator / tick_interval)
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'ticks': self.ticks,
+            'missed_frames': self.missed_frames,
+            'catch_up_ticks': self.catch_up_ticks,
+            'dropped_time': round(self.dropped_time, 3),
+        }
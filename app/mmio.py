@@ -0,0 +1,27 @@
+import mmap
+from hal import DeviceBackend
+from constants import MMAP_WINDOW_SIZE, REGISTER_OFFSETS
+
+class MmapBackend(DeviceBackend):
+    """Register access through an mmap of the BAR0 peripherals page.
+
+    Reads and writes are plain loads and stores on the mapping, with no
+    syscalls. fd can also be a regular file or memfd laid out like the
+    register window, which is how it is exercised without the board.
+    """
+
+    def __init__(self, fd):
+        self.map = mmap.mmap(fd, MMAP_WINDOW_SIZE, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self.words = memoryview(self.map).cast('I')
+        self.index = {register: offset // 4 for register, offset in REGISTER_OFFSETS.items()}
+        self.syscalls = 0
+
+    def read(self, register):
+        return self.words[self.index[register]]
+
+    def write(self, register, value):
+        self.words[self.index[register]] = value & 0xFFFFFFFF
+
+    def close(self):
+        self.words.release()
+        self.map.close()
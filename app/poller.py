@@ -0,0 +1,111 @@
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from constants import BUTTON_CODES
+
+ButtonEvent = namedtuple('ButtonEvent', ['time_ns', 'name', 'pressed'])
+
+def button_edges(old_mask, new_mask, time_ns):
+    """Release/press events for a change of the active-low button mask."""
+    old_name = BUTTON_CODES.get(old_mask, "OFF")
+    new_name = BUTTON_CODES.get(new_mask, "OFF")
+    events = []
+    if old_name != "OFF":
+        events.append(ButtonEvent(time_ns, old_name, False))
+    if new_name != "OFF":
+        events.append(ButtonEvent(time_ns, new_name, True))
+    return events
+
+class ButtonPoller(threading.Thread):
+    """Samples the push buttons on a background thread and queues debounced edges.
+
+    read_buttons returns the raw active-low button mask. A new mask is only
+    accepted after debounce_samples consecutive identical samples; shorter
+    blips are counted as rejected. Events are timestamped at the first sample
+    of the new state, so reported latency includes the debounce delay.
+    """
+
+    def __init__(self, read_buttons, rate_hz=1000, debounce_samples=5):
+        super().__init__(daemon=True)
+        self.read_buttons = read_buttons
+        self.period = 1 / rate_hz
+        self.debounce_samples = debounce_samples
+        self.events = queue.SimpleQueue()
+        self.stopped = threading.Event()
+        self.samples = 0
+        self.presses = 0
+        self.releases = 0
+        self.rejected = 0
+        self.latencies_ns = deque(maxlen=4096)
+        self.started_ns = None
+
+    def run(self):
+        self.started_ns = time.perf_counter_ns()
+        stable = candidate = self.read_buttons()
+        candidate_ns = 0
+        count = 0
+        deadline = time.perf_counter()
+        while not self.stopped.is_set():
+            raw = self.read_buttons()
+            self.samples += 1
+            if raw != candidate:
+                if candidate != stable:
+                    self.rejected += 1
+                candidate = raw
+                candidate_ns = time.perf_counter_ns()
+                count = 0
+            if candidate != stable:
+                count += 1
+                if count >= self.debounce_samples:
+                    self.emit(stable, candidate, candidate_ns)
+                    stable = candidate
+
+            deadline += self.period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.perf_counter()
+
+    def emit(self, old_mask, new_mask, time_ns):
+        for event in button_edges(old_mask, new_mask, time_ns):
+            if event.pressed:
+                self.presses += 1
+            else:
+                self.releases += 1
+            self.events.put(event)
+
+    def drain(self):
+        events = []
+        now = time.perf_counter_ns()
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return events
+            self.latencies_ns.append(now - event.time_ns)
+            events.append(event)
+
+    def stop(self):
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+
+    def stats(self):
+        latencies = sorted(self.latencies_ns)
+        elapsed = (time.perf_counter_ns() - self.started_ns) / 1e9 if self.started_ns else 0
+        accepted = self.presses + self.releases
+        return {
+            'samples': self.samples,
+            'sample_rate_hz': round(self.samples / elapsed) if elapsed else 0,
+            'presses': self.presses,
+            'releases': self.releases,
+            'rejected': self.rejected,
+            # Share of button changes the debounce discarded as blips. A press
+            # too short to be sampled at all never shows up here.
+            'rejected_rate': round(self.rejected / (accepted + self.rejected), 4) if accepted + self.rejected else 0.0,
+            'latency_ms_mean': round(sum(latencies) / len(latencies) / 1e6, 3) if latencies else None,
+            'latency_ms_p95': round(latencies[int(len(latencies) * 0.95)] / 1e6, 3) if latencies else None,
+            'latency_ms_max': round(latencies[-1] / 1e6, 3) if latencies else None,
+        }
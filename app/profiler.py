@@ -0,0 +1,127 @@
+import csv
+import json
+import time
+from collections import deque
+
+PHASES = ('input', 'update', 'draw', 'display', 'device')
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+class FrameProfiler:
+    """Per-frame timings of the main loop phases, taken with perf_counter_ns.
+
+    begin_frame() starts a frame, mark(phase) charges the time since the
+    previous mark to phase, and end_frame() closes it. Frames whose busy time
+    (everything but the wait in clock.tick) exceeds budget are overruns.
+    The last `window` frames feed the percentiles and the dump.
+    """
+
+    def __init__(self, budget, window=3600, refresh_frames=30):
+        self.budget_ns = round(budget * 1e9)
+        self.samples = {phase: deque(maxlen=window) for phase in PHASES + ('total',)}
+        self.frames = 0
+        self.overruns = 0
+        self.current = dict.fromkeys(PHASES, 0)
+        self.last_ns = self.start_ns = 0
+        self.visible = False
+        self.refresh_frames = refresh_frames
+        self.lines = []
+
+    def begin_frame(self):
+        self.last_ns = self.start_ns = time.perf_counter_ns()
+        for phase in PHASES:
+            self.current[phase] = 0
+
+    def mark(self, phase):
+        now = time.perf_counter_ns()
+        self.current[phase] += now - self.last_ns
+        self.last_ns = now
+
+    def end_frame(self):
+        total = self.last_ns - self.start_ns
+        for phase in PHASES:
+            self.samples[phase].append(self.current[phase])
+        self.samples['total'].append(total)
+        self.frames += 1
+        if total > self.budget_ns:
+            self.overruns += 1
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def summary(self):
+        result = {'frames': self.frames, 'overruns': self.overruns}
+        for phase, samples in self.samples.items():
+            if not samples:
+                continue
+            values = sorted(samples)
+            result[phase] = {
+                'mean_ms': round(sum(values) / len(values) / 1e6, 3),
+                'p50_ms': round(percentile(values, 0.50) / 1e6, 3),
+                'p95_ms': round(percentile(values, 0.95) / 1e6, 3),
+                'p99_ms': round(percentile(values, 0.99) / 1e6, 3),
+            }
+        return result
+
+    def draw(self, screen, text):
+        """Draw the overlay in the top right corner and return its rects."""
+        if not self.visible:
+            return []
+        # Percentiles are recomputed every refresh_frames, not on every frame
+        if not self.lines or self.frames % self.refresh_frames == 0:
+            summary = self.summary()
+            self.lines = [f'{"phase":<8}{"p50":>8}{"p95":>8}{"p99":>8}']
+            for phase in PHASES + ('total',):
+                if phase in summary:
+                    times = summary[phase]
+                    self.lines.append(f'{phase:<8}{times["p50_ms"]:>8.2f}{times["p95_ms"]:>8.2f}{times["p99_ms"]:>8.2f}')
+            self.lines.append(f'overruns {self.overruns}/{self.frames}')
+
+        rects = []
+        top = 10
+        for line in self.lines:
+            surface = text.render(line, 20, (255, 255, 255))
+            rect = surface.get_rect(topright=(screen.get_width() - 10, top))
+            rects.append(screen.blit(surface, rect))
+            top = rect.bottom + 2
+        return rects
+
+    def dump(self, path):
+        """Write the per-frame samples as CSV, or samples and summary as JSON (.json)."""
+        columns = PHASES + ('total',)
+        rows = zip(*(self.samples[phase] for phase in columns))
+        if path.endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump({'summary': self.summary(), 'columns': columns, 'frames_ns': list(rows)}, f)
+            return
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([f'{phase}_ns' for phase in columns])
+            writer.writerows(rows)
+
+class NullProfiler:
+    """Stand-in used when profiling is off; every call is a no-op."""
+
+    visible = False
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def toggle(self):
+        pass
+
+    def summary(self):
+        return {}
+
+    def draw(self, screen, text):
+        return []
+
+    def dump(self, path):
+        pass
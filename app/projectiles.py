@@ -0,0 +1,189 @@
+import math
+from board import PROJECTILE
+from settings import ATTACK_PATTERNS
+
+# NumPy is optional; without it projectiles fall back to plain lists
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Angle covered by the spread pattern, centred on straight down
+SPREAD_ANGLE = math.pi / 2
+
+def pattern_velocities(pattern, count, speed):
+    """Velocities of the projectiles fired by one attack, in cells per tick.
+
+    single fires one projectile straight down, spread fans count of them
+    over SPREAD_ANGLE below the boss and ring fires count of them all around.
+    """
+    if pattern not in ATTACK_PATTERNS:
+        raise ValueError(f'unknown attack pattern: {pattern}')
+    if pattern == 'single' or count == 1:
+        return [(0.0, speed)]
+    if pattern == 'spread':
+        angles = [-SPREAD_ANGLE / 2 + SPREAD_ANGLE * i / (count - 1) for i in range(count)]
+    else:
+        angles = [2 * math.pi * i / count for i in range(count)]
+    return [(math.sin(angle) * speed, math.cos(angle) * speed) for angle in angles]
+
+def shift_cell(grid, cell, delta):
+    # Like grid.add/remove, without marking the cell changed
+    layer = grid.layers[PROJECTILE]
+    layer[cell] += delta
+    index = grid.index[PROJECTILE]
+    if index is not None and layer[cell] == (delta > 0):
+        if delta > 0:
+            index.bucket(cell).add(cell)
+        else:
+            index.bucket(cell).discard(cell)
+
+class ProjectileBuffer:
+    """Boss projectiles as NumPy struct-of-arrays: position, velocity and cell.
+
+    The first count slots hold the live projectiles in firing order. Arrays
+    double in capacity when full. step() moves every projectile, drops those
+    that left the board and updates the grid's PROJECTILE layer with a few
+    array operations, whatever the number of projectiles. Projectiles are
+    redrawn every frame, so their cells are never marked changed on the grid.
+    """
+
+    def __init__(self, grid, capacity=64):
+        self.grid = grid
+        self.count = 0
+        self.x = np.empty(capacity)
+        self.y = np.empty(capacity)
+        self.vx = np.empty(capacity)
+        self.vy = np.empty(capacity)
+        self.cells = np.empty(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self.count
+
+    def grow(self, needed):
+        capacity = len(self.x)
+        while capacity < needed:
+            capacity *= 2
+        for name in ('x', 'y', 'vx', 'vy', 'cells'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(self, x, y, velocities):
+        """Fire one projectile from (x, y) per (vx, vy) in velocities."""
+        start, end = self.count, self.count + len(velocities)
+        if end > len(self.x):
+            self.grow(end)
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.vx[start:end], self.vy[start:end] = zip(*velocities)
+        cells = self.cells[start:end]
+        cells[:] = int(y) * self.grid.size + int(x)
+        self.count = end
+        self.shift_layer(cells, 1)
+
+    def step(self):
+        n = self.count
+        if not n:
+            return
+        size = self.grid.size
+        x, y = self.x[:n], self.y[:n]
+        x += self.vx[:n]
+        y += self.vy[:n]
+        alive = (x >= 0) & (x < size) & (y >= 0) & (y < size)
+        old_cells = self.cells[:n]
+        new_cells = y.astype(np.int64) * size + x.astype(np.int64)
+        # Only projectiles that left their cell touch the layer
+        entered = alive & (new_cells != old_cells)
+        self.shift_layer(old_cells[entered | ~alive], -1)
+        self.shift_layer(new_cells[entered], 1)
+        if alive.all():
+            old_cells[:] = new_cells
+            return
+        # Compaction keeps the survivors in firing order
+        n = self.count = int(alive.sum())
+        for array, values in ((self.x, x), (self.y, y), (self.vx, self.vx[:len(alive)]),
+                              (self.vy, self.vy[:len(alive)]), (self.cells, new_cells)):
+            array[:n] = values[alive]
+
+    def shift_layer(self, cells, delta):
+        grid = self.grid
+        if grid.index[PROJECTILE] is not None:
+            # Someone queries projectiles spatially; keep the index exact
+            for cell in cells.tolist():
+                shift_cell(grid, cell, delta)
+            return
+        layer = np.frombuffer(grid.layers[PROJECTILE], dtype=np.uint16)
+        if delta > 0:
+            np.add.at(layer, cells, 1)
+        else:
+            np.subtract.at(layer, cells, 1)
+
+    def clear(self):
+        self.shift_layer(self.cells[:self.count], -1)
+        self.count = 0
+
+    def positions(self):
+        """(x, y) of every live projectile, in firing order."""
+        n = self.count
+        return list(zip(self.x[:n].tolist(), self.y[:n].tolist()))
+
+    def visible(self, camera, alpha=1.0):
+        """View coordinates of the projectiles on screen, interpolated alpha into the last tick."""
+        n = self.count
+        lag = 1 - alpha
+        ox, oy = camera.offset(self.x[:n] - self.vx[:n] * lag, self.y[:n] - self.vy[:n] * lag)
+        view = camera.view_cells
+        shown = (ox > -1) & (ox < view) & (oy > -1) & (oy < view)
+        return zip(ox[shown].tolist(), oy[shown].tolist())
+
+class ProjectileList:
+    """Same interface as ProjectileBuffer on plain lists, used without NumPy."""
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def spawn(self, x, y, velocities):
+        grid = self.grid
+        cell = int(y) * grid.size + int(x)
+        for vx, vy in velocities:
+            self.items.append([x, y, vx, vy, cell])
+            shift_cell(grid, cell, 1)
+
+    def step(self):
+        grid = self.grid
+        size = grid.size
+        remaining = []
+        for item in self.items:
+            shift_cell(grid, item[4], -1)
+            item[0] += item[2]
+            item[1] += item[3]
+            if 0 <= item[0] < size and 0 <= item[1] < size:
+                item[4] = int(item[1]) * size + int(item[0])
+                shift_cell(grid, item[4], 1)
+                remaining.append(item)
+        self.items = remaining
+
+    def clear(self):
+        for item in self.items:
+            shift_cell(self.grid, item[4], -1)
+        self.items = []
+
+    def positions(self):
+        return [(item[0], item[1]) for item in self.items]
+
+    def visible(self, camera, alpha=1.0):
+        lag = 1 - alpha
+        for x, y, vx, vy, _ in self.items:
+            ox, oy = camera.offset(x - vx * lag, y - vy * lag)
+            if camera.visible(ox, oy):
+                yield ox, oy
+
+def projectile_buffer(grid):
+    """A ProjectileBuffer, or a ProjectileList when NumPy is missing."""
+    return ProjectileBuffer(grid) if np is not None else ProjectileList(grid)
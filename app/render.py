@@ -0,0 +1,199 @@
+import pygame
+from collections import OrderedDict
+
+# NumPy is optional; only CellArrayRenderer needs it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class TextCache:
+    """Font registry plus an LRU cache of rendered text surfaces.
+
+    Surfaces are keyed by (text, size, color), so static labels are rendered
+    once and counters only re-render when their value changes.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.font(size).render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.surfaces)}
+
+class DirtyRectRenderer:
+    """Restores and flips only the screen regions that changed since the last frame.
+
+    Grid cells whose occupancy changed are restored from the cached background
+    before drawing. Volatile regions (alpha blits, text, animated sprites) are
+    redrawn every frame, so they are also restored on the frame after.
+    """
+
+    def __init__(self, background, max_rects=128):
+        self.background = background
+        self.max_rects = max_rects
+        self.dirty = []
+        self.volatile = []
+        self.full_update = True
+
+    def invalidate(self):
+        self.full_update = True
+
+    def clear(self, screen, rects):
+        if self.full_update:
+            screen.blit(self.background, (0, 0))
+            return
+        self.dirty = rects + self.volatile
+        for rect in self.dirty:
+            screen.blit(self.background, rect, rect)
+
+    def collect(self, screen, volatile):
+        """Return the rects to pass to pygame.display.update for this frame."""
+        self.volatile = volatile
+        if self.full_update:
+            self.full_update = False
+            return [screen.get_rect()]
+        dirty = self.dirty + volatile
+        # Many tiny rects cost more to flip than their bounding box
+        if len(dirty) > self.max_rects:
+            dirty = [dirty[0].unionall(dirty[1:])]
+        return dirty
+
+class CellArrayRenderer:
+    """Draws every grid cell on screen with one scaled blit from a color array.
+
+    paint() fills a (view_cells, view_cells, 3) uint8 array, indexed [x, y]
+    like pygame.surfarray, from the occupancy layers of the cells in view;
+    render() uploads it to a surface of one pixel per cell, scales that to the
+    window with a single transform.scale and blits it over the cached
+    background, with empty cells keyed out. The result is kept until the
+    array changes, so frames between ticks cost a single blit. The cost
+    depends on the view size only, not on how many entities are on the
+    board. Every frame is a full frame, so it offers the DirtyRectRenderer
+    calls without tracking rects.
+    """
+
+    def __init__(self, background, view_cells, key=(255, 0, 255)):
+        self.background = background
+        self.key = key
+        self.cells = np.empty((view_cells, view_cells, 3), dtype=np.uint8)
+        self.last_cells = None
+        # Surfaces in the background's (display) format blit several times faster
+        self.small = pygame.Surface((view_cells, view_cells)).convert(background)
+        self.scaled = background.copy()
+        self.scaled.set_colorkey(key)
+        self.composite = background.copy()
+        # Rows and columns of the world in view, cached per camera position
+        self.origin = None
+        self.rows = self.columns = None
+
+    def invalidate(self):
+        pass
+
+    def clear(self, screen, rects):
+        # render() covers the whole screen
+        pass
+
+    def paint(self, grid, camera, kinds):
+        """Color the cells in view; kinds is a list of (kind, color), later kinds on top."""
+        if self.origin != (camera.x, camera.y):
+            self.origin = (camera.x, camera.y)
+            view = np.arange(camera.view_cells)
+            self.rows = ((camera.y + view) % grid.size)[None, :]
+            self.columns = ((camera.x + view) % grid.size)[:, None]
+        cells = self.cells
+        cells[:] = self.key
+        for kind, color in kinds:
+            layer = np.frombuffer(grid.layers[kind], dtype=np.uint16).reshape(grid.size, grid.size)
+            # Indexed [x, y] to match the surface
+            cells[layer[self.rows, self.columns] > 0] = color
+        return cells
+
+    def render(self, screen):
+        if self.last_cells is None or not np.array_equal(self.cells, self.last_cells):
+            self.last_cells = self.cells.copy()
+            pygame.surfarray.blit_array(self.small, self.cells)
+            pygame.transform.scale(self.small, self.scaled.get_size(), self.scaled)
+            self.composite.blit(self.background, (0, 0))
+            self.composite.blit(self.scaled, (0, 0))
+        return screen.blit(self.composite, (0, 0))
+
+    def collect(self, screen, volatile):
+        return [screen.get_rect()]
+
+class Camera:
+    """Viewport of view_cells x view_cells cells over a wrapping world.
+
+    The camera only moves when the followed cell leaves the dead zone, margin
+    cells from the view edges, and always by whole cells. offset() maps world
+    cell coordinates to view coordinates, taking the shortest way around the
+    wrapped edges. A world no larger than the view keeps the camera at (0, 0).
+    """
+
+    def __init__(self, world_size, view_cells, cell_size, margin=None):
+        self.world_size = world_size
+        self.view_cells = view_cells
+        self.cell_size = cell_size
+        self.margin = view_cells // 4 if margin is None else margin
+        # Coordinates up to pad cells left of or above the view stay negative
+        self.pad = (world_size - view_cells) // 2
+        self.x = 0
+        self.y = 0
+
+    def offset(self, x, y):
+        size, pad = self.world_size, self.pad
+        return (x - self.x + pad) % size - pad, (y - self.y + pad) % size - pad
+
+    def follow(self, x, y):
+        """Keep cell (x, y) inside the dead zone; return whether the camera moved."""
+        if self.world_size <= self.view_cells:
+            return False
+        ox, oy = self.offset(x, y)
+        low, high = self.margin, self.view_cells - 1 - self.margin
+        dx = ox - low if ox < low else ox - high if ox > high else 0
+        dy = oy - low if oy < low else oy - high if oy > high else 0
+        if not dx and not dy:
+            return False
+        self.x = (self.x + dx) % self.world_size
+        self.y = (self.y + dy) % self.world_size
+        return True
+
+    def visible(self, ox, oy, size=1):
+        """Whether a size x size block at view coordinates (ox, oy) overlaps the view."""
+        return -size < ox < self.view_cells and -size < oy < self.view_cells
+
+    def cell_rect(self, cell):
+        """Screen rect of a world cell, or None when it is off the view."""
+        y, x = divmod(cell, self.world_size)
+        ox, oy = self.offset(x, y)
+        if not self.visible(ox, oy):
+            return None
+        return pygame.Rect(ox * self.cell_size, oy * self.cell_size, self.cell_size, self.cell_size)
+
+    def view(self):
+        """The viewed world rectangle as (x, y, width, height), for spatial queries."""
+        return self.x, self.y, self.view_cells, self.view_cells
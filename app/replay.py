@@ -0,0 +1,142 @@
+"""Record game inputs and replay them headlessly at full speed.
+
+A recording is the game seed plus every non-empty input the simulation
+consumed, tagged with its tick, and ends with the final tick count and the
+state hash. Since the seed fixes every random choice, replaying the inputs
+on a fresh headless game must reach the same hash.
+
+Run from the repository root:
+
+    python app/replay.py last_game.rec [--repeat N]
+"""
+import argparse
+import struct
+import sys
+import time
+from pygame.math import Vector2
+from game import Game, InputHandler, ScriptedInput, CELL_NUMBER
+
+MAGIC = b'SSRP'
+VERSION = 1
+HEADER = struct.Struct('<4sBHQ')    # magic, version, cell number, seed
+RECORD = struct.Struct('<IB')       # tick, input code
+END = 0                             # code of the closing record, followed by the state hash
+HASH_SIZE = 16
+
+# Input codes; directions are stored by name so the file does not depend on Vector2
+INPUTS = ("UP", "DOWN", "LEFT", "RIGHT", "START", "BOOST")
+CODES = {name: code for code, name in enumerate(INPUTS, 1)}
+DIRECTIONS = {
+    "UP": Vector2(0, -1),
+    "DOWN": Vector2(0, 1),
+    "LEFT": Vector2(-1, 0),
+    "RIGHT": Vector2(1, 0)
+}
+
+def direction_name(direction):
+    for name, vector in DIRECTIONS.items():
+        if vector == direction:
+            return name
+    raise ValueError(f'not a direction: {direction}')
+
+class RecordingInput(InputHandler):
+    """Passes another input handler through and logs what the game consumed.
+
+    start(game) must be called once the game exists, so each input can be
+    tagged with the tick that consumed it. close() writes the closing record;
+    the wrapped handler is left for its owner to close.
+    """
+
+    def __init__(self, handler, path):
+        self.handler = handler
+        self.file = open(path, 'wb')
+        self.game = None
+
+    def start(self, game):
+        self.game = game
+        self.file.write(HEADER.pack(MAGIC, VERSION, CELL_NUMBER, game.seed))
+
+    def record(self, name):
+        self.file.write(RECORD.pack(self.game.tick, CODES[name]))
+
+    def get_direction(self):
+        direction = self.handler.get_direction()
+        if direction:
+            self.record(direction_name(direction))
+        return direction
+
+    def get_action(self):
+        action = self.handler.get_action()
+        if action:
+            self.record(action)
+        return action
+
+    def process_events(self, events):
+        self.handler.process_events(events)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.write(RECORD.pack(self.game.tick, END))
+        self.file.write(bytes.fromhex(self.game.state_hash()))
+        self.file.close()
+
+def load(path):
+    """Return (seed, inputs, final_tick, state_hash); inputs are (tick, name) pairs."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, cell_number, seed = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} recording')
+    if cell_number != CELL_NUMBER:
+        raise ValueError(f'{path} was recorded on a {cell_number}x{cell_number} board, not {CELL_NUMBER}x{CELL_NUMBER}')
+
+    inputs = []
+    offset = HEADER.size
+    while True:
+        tick, code = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if code == END:
+            return seed, inputs, tick, data[offset:offset + HASH_SIZE].hex()
+        inputs.append((tick, INPUTS[code - 1]))
+
+def replay(seed, inputs, final_tick):
+    """Re-simulate a recording on a headless game and return the game."""
+    handler = ScriptedInput()
+    game = Game(handler, headless=True, seed=seed)
+    pending = iter(inputs)
+    next_input = next(pending, None)
+    for tick in range(final_tick):
+        while next_input is not None and next_input[0] == tick:
+            name = next_input[1]
+            if name in DIRECTIONS:
+                handler.push(direction=DIRECTIONS[name])
+            else:
+                handler.push(action=name)
+            next_input = next(pending, None)
+        game.update()
+    return game
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--repeat', type=int, default=1, help='replay several times to benchmark')
+    args = parser.parse_args()
+
+    seed, inputs, final_tick, expected = load(args.path)
+    print(f'seed {seed}, {len(inputs)} inputs over {final_tick} ticks')
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        game = replay(seed, inputs, final_tick)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        actual = game.state_hash()
+        if actual != expected:
+            print(f'state hash mismatch: expected {expected}, got {actual}')
+            sys.exit(1)
+    print(f'state hash {actual} matches')
+    print(f'{final_tick} ticks in {best:.3f}s -> {final_tick / best:,.0f} ticks/sec')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import threading
+from constants import WR_L_DISPLAY, WR_R_DISPLAY
+from utils import seven_segment_encoder
+
+class Scoreboard(threading.Thread):
+    """Mirrors two game values on the 7-segment displays from a background thread.
+
+    show() only stores the latest values and wakes the thread, so the render
+    loop never waits on the device. The thread writes a display only when its
+    value changed since the last write, and is the only one flushing the HAL:
+    the Animator stages its frames and calls request_flush(). A display held
+    by an animation is left alone until restore() hands it back.
+    """
+
+    REGISTERS = (WR_L_DISPLAY, WR_R_DISPLAY)
+    # Active-low segments, all off
+    BLANK = 0xFFFFFFFF
+
+    def __init__(self, hal, hex=False):
+        super().__init__(daemon=True)
+        self.hal = hal
+        self.hex = hex
+        self.values = (None, None)
+        self.shown = [None, None]
+        self.held = set()
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.stopped = threading.Event()
+        self.updates = 0
+        self.writes = 0
+
+    def show(self, left, right):
+        if (left, right) != self.values:
+            self.values = (left, right)
+            self.changed.set()
+
+    def request_flush(self):
+        self.changed.set()
+
+    def hold(self, register):
+        """Leave a display to the Animator until restore()."""
+        with self.lock:
+            self.held.add(register)
+
+    def restore(self, register):
+        """Take a display back from the Animator and rewrite the stored value."""
+        index = self.REGISTERS.index(register)
+        with self.lock:
+            self.held.discard(register)
+            self.shown[index] = None
+            if self.values[index] is None:
+                self.hal.set(register, self.BLANK)
+        self.changed.set()
+
+    def run(self):
+        while True:
+            self.changed.wait()
+            self.changed.clear()
+            if self.stopped.is_set():
+                return
+            self.update()
+
+    def update(self):
+        with self.lock:
+            for index, (register, value) in enumerate(zip(self.REGISTERS, self.values)):
+                if register in self.held or value is None or value == self.shown[index]:
+                    continue
+                self.hal.set(register, seven_segment_encoder(value, self.hex))
+                self.shown[index] = value
+                self.writes += 1
+        # Also sends whatever the Animator staged since the last update
+        self.hal.end_frame()
+        self.updates += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.changed.set()
+        if self.is_alive():
+            self.join()
+
+    def stats(self):
+        return {'updates': self.updates, 'writes': self.writes, 'shown': tuple(self.shown)}
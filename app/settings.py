@@ -0,0 +1,144 @@
+import json
+import os
+from dataclasses import dataclass, fields
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# $SPACE_SNAKE_CONFIG points the game at another config, e.g. for benchmarks
+CONFIG_PATH = os.environ.get('SPACE_SNAKE_CONFIG', os.path.join(ROOT, 'config.json'))
+HIGH_SCORE_PATH = os.path.join(ROOT, 'high_score.txt')
+LAST_GAME_PATH = os.path.join(ROOT, 'last_game.rec')
+FRAME_PROFILE_PATH = os.path.join(ROOT, 'frame_profile.csv')
+
+Color = tuple
+# Grid renderers: one rect per entity, or one blit of a cell-color array (NumPy)
+RENDERERS = ('rects', 'array')
+# Boss attack patterns, see projectiles.pattern_velocities()
+ATTACK_PATTERNS = ('single', 'spread', 'ring')
+# Points that defeat a boss, in Game and BatchEnv alike. The game has always
+# used 5; boss.points_needed_to_defeat in config.json is not read
+BOSS_POINTS_NEEDED = 5
+
+@dataclass(frozen=True)
+class GameSettings:
+    cell_size: int
+    cell_number: int
+    world_size: int
+    fps: float
+    render_fps: int
+    renderer: str
+    fps_increase_rate: float
+    initial_asteroids: int
+    asteroids_increase_interval: int
+
+    def __post_init__(self):
+        require(self.cell_size > 0 and self.cell_number > 0, 'the board needs a positive cell size and number')
+        require(self.world_size >= self.cell_number, 'world_size cannot be smaller than the cell_number on screen')
+        require(self.fps > 0 and self.render_fps > 0, 'fps and render_fps must be positive')
+        require(self.renderer in RENDERERS, f'renderer must be one of {", ".join(RENDERERS)}')
+        require(self.fps_increase_rate >= 0, 'fps_increase_rate cannot be negative')
+        require(0 <= self.initial_asteroids < self.world_size ** 2, 'initial_asteroids must fit on the board')
+        require(self.asteroids_increase_interval > 0, 'asteroids_increase_interval must be positive')
+
+@dataclass(frozen=True)
+class Colors:
+    space: Color
+    star: Color
+    ship: Color
+    asteroid: Color
+    resource: Color
+    boss: Color
+    boss_projectile: Color
+
+    def __post_init__(self):
+        for field in fields(self):
+            color = getattr(self, field.name)
+            require(len(color) == 3 and all(isinstance(c, int) and 0 <= c <= 255 for c in color),
+                    f'colors.{field.name} must be three integers from 0 to 255')
+
+@dataclass(frozen=True)
+class SpaceshipSettings:
+    initial_length: int
+    boost_speed_multiplier: int
+    boost_cooldown: int
+
+    def __post_init__(self):
+        require(self.initial_length > 0, 'initial_length must be positive')
+        require(self.boost_speed_multiplier >= 1, 'boost_speed_multiplier must be at least 1')
+        require(self.boost_cooldown > 0, 'boost_cooldown must be positive')
+
+@dataclass(frozen=True)
+class BossSettings:
+    spawn_score: int
+    base_size: int
+    health: int
+    movement_interval: int
+    attack_interval: int
+    projectile_speed: float
+    attack_pattern: str
+    projectiles_per_attack: int
+    wobble_speed: float
+    wobble_amplitude: float
+    spawn_delay: int
+    points_needed_to_defeat: int
+
+    def __post_init__(self):
+        require(self.base_size > 0, 'boss base_size must be positive')
+        require(self.movement_interval > 0 and self.attack_interval > 0, 'boss intervals must be positive')
+        require(self.projectile_speed > 0, 'projectile_speed must be positive')
+        require(self.attack_pattern in ATTACK_PATTERNS, f'attack_pattern must be one of {", ".join(ATTACK_PATTERNS)}')
+        require(self.projectiles_per_attack > 0, 'projectiles_per_attack must be positive')
+
+@dataclass(frozen=True)
+class Scoring:
+    resource_points: int
+    boss_defeat_bonus: int
+    boss_spawn_score_increase: int
+
+@dataclass(frozen=True)
+class Settings:
+    game_settings: GameSettings
+    colors: Colors
+    spaceship: SpaceshipSettings
+    boss: BossSettings
+    scoring: Scoring
+
+    def __post_init__(self):
+        require(self.boss.base_size <= self.game_settings.cell_number, 'the boss does not fit on the board')
+
+def require(condition, message):
+    if not condition:
+        raise ValueError(f'invalid config: {message}')
+
+def build(cls, data, section):
+    """Instantiate a settings dataclass from its config section, checking keys and types."""
+    if not isinstance(data, dict):
+        raise ValueError(f'invalid config: {section} must be an object')
+    names = {field.name for field in fields(cls)}
+    unknown = data.keys() - names
+    missing = names - data.keys()
+    require(not unknown, f'unknown keys in {section}: {", ".join(sorted(unknown))}')
+    require(not missing, f'missing keys in {section}: {", ".join(sorted(missing))}')
+
+    values = {}
+    for field in fields(cls):
+        value = data[field.name]
+        if field.type is Color:
+            require(isinstance(value, list), f'{section}.{field.name} must be a list')
+            value = tuple(value)
+        elif field.type is float:
+            require(isinstance(value, (int, float)) and not isinstance(value, bool), f'{section}.{field.name} must be a number')
+        elif field.type is str:
+            require(isinstance(value, str), f'{section}.{field.name} must be a string')
+        elif field.type is int:
+            require(isinstance(value, int) and not isinstance(value, bool), f'{section}.{field.name} must be an integer')
+        values[field.name] = value
+    return cls(**values)
+
+def load_settings(path=CONFIG_PATH):
+    """Read and validate config.json once; raises ValueError on a bad config."""
+    with open(path, 'r') as config_file:
+        config = json.load(config_file)
+    sections = {field.name: build(field.type, config.get(field.name), field.name) for field in fields(Settings)}
+    unknown = config.keys() - sections.keys()
+    require(not unknown, f'unknown sections: {", ".join(sorted(unknown))}')
+    return Settings(**sections)
@@ -0,0 +1,91 @@
+import math
+import pygame
+
+# Steps of the boss wobble cycle kept pre-rendered. A frame holds the raw
+# pixels of the whole boss (400 KB at 60 px cells), so the count stays low:
+# the nearest step is off by at most wobble_amplitude * pi / WOBBLE_FRAMES cells
+WOBBLE_FRAMES = 8
+# Vertices of the boss outline
+BOSS_VERTICES = 16
+# Trail tiles fade from red to transparent
+TRAIL_COLOR = (255, 0, 0)
+# Transparent pixels of the opaque sprites; no game color may use it
+KEY = (255, 0, 255)
+
+def keyed_surface(size):
+    # Display format with an RLE colorkey: a solid shape blits several times
+    # faster than an alpha or paletted surface would
+    surface = pygame.Surface(size).convert()
+    surface.fill(KEY)
+    surface.set_colorkey(KEY, pygame.RLEACCEL)
+    return surface
+
+class SpriteCache:
+    """Pre-rendered surfaces for the parts of a frame that used to be rebuilt every frame.
+
+    - boss: WOBBLE_FRAMES outlines covering one wobble cycle; boss_frame()
+      picks the one nearest to a wobble phase.
+    - trail: one alpha tile per (segment, trail length) pair.
+    - head: the ship head with its direction indicator, per direction.
+
+    Everything is built once, when the renderer is created (the display mode
+    must be set), so drawing is blits only. memory() reports the pixel bytes
+    held; RLE-encoded sprites also keep a smaller encoded copy.
+    """
+
+    def __init__(self, cell_size, boss_size, wobble_amplitude, trail_length, ship_color, indicator_color, boss_color):
+        self.cell_size = cell_size
+        self.boss_frames = [self.render_boss(boss_size, wobble_amplitude, boss_color, 2 * math.pi * i / WOBBLE_FRAMES)
+                            for i in range(WOBBLE_FRAMES)]
+        self.trail = {(i, length): self.render_trail_tile(255 * (1 - i / length))
+                      for length in range(1, trail_length + 1) for i in range(length)}
+        self.heads = {(dx, dy): self.render_head(dx, dy, ship_color, indicator_color)
+                      for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))}
+
+    def render_boss(self, size, amplitude, color, phase):
+        cell_size = self.cell_size
+        extent = math.ceil((size / 2 + amplitude) * cell_size) + 1
+        surface = keyed_surface((2 * extent, 2 * extent))
+        points = []
+        for i in range(BOSS_VERTICES):
+            angle = i * (2 * math.pi / BOSS_VERTICES)
+            wobble = math.sin(angle * 4 + phase) * amplitude
+            radius = (size / 2 + wobble) * cell_size
+            points.append((extent + math.cos(angle) * radius, extent + math.sin(angle) * radius))
+        pygame.draw.polygon(surface, color, points)
+        return surface
+
+    def render_trail_tile(self, opacity):
+        tile = pygame.Surface((self.cell_size, self.cell_size), pygame.SRCALPHA)
+        tile.fill(TRAIL_COLOR + (int(opacity),))
+        return tile.convert_alpha()
+
+    def render_head(self, dx, dy, ship_color, indicator_color):
+        cell_size = self.cell_size
+        # The indicator tip reaches one pixel into the next cell
+        surface = keyed_surface((cell_size + 1, cell_size + 1))
+        block_rect = pygame.draw.rect(surface, ship_color, (0, 0, cell_size, cell_size))
+        pygame.draw.polygon(surface, indicator_color, [
+            (block_rect.centerx, block_rect.centery),
+            (block_rect.centerx + dx * cell_size // 2, block_rect.centery + dy * cell_size // 2),
+            (block_rect.centerx - dy * cell_size // 4, block_rect.centery + dx * cell_size // 4),
+        ])
+        return surface
+
+    def boss_frame(self, phase):
+        """The pre-rendered outline nearest to a wobble phase, in radians."""
+        return self.boss_frames[round(phase / (2 * math.pi) * WOBBLE_FRAMES) % WOBBLE_FRAMES]
+
+    def trail_tile(self, segment, length):
+        return self.trail[segment, length]
+
+    def head(self, direction):
+        return self.heads[int(direction.x), int(direction.y)]
+
+    def memory(self):
+        """Bytes of pixel data per sprite group."""
+        groups = {'boss': self.boss_frames, 'trail': self.trail.values(), 'head': self.heads.values()}
+        report = {name: sum(surface.get_pitch() * surface.get_height() for surface in surfaces)
+                  for name, surfaces in groups.items()}
+        report['total'] = sum(report.values())
+        return report
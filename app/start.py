@@ -1,9 +1,12 @@
-from constants import PATH, BUTTONS_OPTIONS
+from constants import BUTTON_NAMES, ALL_SWITCHES
 from utils import red_leds, green_leds, read_switches, read_button
-import os
+from hal import open_device
 from time import sleep
 
-fd = os.open(PATH, os.O_RDWR)
+# The board by default; DE2I_BACKEND=fake runs the show without it
+fd = open_device()
+# Change events need their own open file, so register reads on fd are unaffected
+events = fd.events()
 print('Arquivo aberto com sucesso!')
 
 def reset():
@@ -15,7 +18,8 @@ def reset():
     read_button(fd=fd, show_output_msg=True)
     read_button(fd=fd, show_output_msg=True)    
 
-    os.close(fd)
+    fd.close()
+    events.stop()
     print('\nArquivo fechado com sucesso!\n')
 
 def start():
@@ -23,10 +27,8 @@ def start():
 
     print('\nAperte o botão de START para o show começar :)\n')
 
-    while True:
-        button = read_button(fd=fd, show_output_msg=False)
-        if BUTTONS_OPTIONS[button] == "START":
-            break
+    # Sleeps in poll() until the driver reports a button change
+    events.wait_for(lambda switches, buttons: BUTTON_NAMES[buttons & 0b1111] == "START")
 
     # print('\nPreparando para iniciar o jogo...')
     # countdown(fd, start_num=3, delay=1)
@@ -50,10 +52,7 @@ def start():
 
     print('\nLigue todos os switches para o jogo começar!\n')
 
-    while True:
-        switches = read_switches(fd=fd, show_output_msg=False)
-        if switches == '0b111111111111111111':
-            break
+    events.wait_for(lambda switches, buttons: switches == ALL_SWITCHES)
 
     reset()
 
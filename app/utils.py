@@ -1,59 +1,68 @@
 import os
+import struct
+from array import array
 from fcntl import ioctl
 from time import sleep
-from constants import SEVEN_SEGMENT_OPTIONS, WR_RED_LEDS, WR_GREEN_LEDS, RD_SWITCHES, RD_PBUTTONS
-
-def seven_segment_encoder(num):
-    display = 0
-    num_digits = 0
-
-    while True:
-        digit = num % 10
-        display |= (SEVEN_SEGMENT_OPTIONS[digit] << 8 * num_digits)
-        num_digits += 1
-        num = num // 10
-        
-        if num == 0:
-            break
-
-    for i in range (num_digits, num_digits + (4 - num_digits)):
-        display |= (SEVEN_SEGMENT_OPTIONS["OFF"] << 8 * i)
-
-    return display
+from constants import SEVEN_SEGMENT_OPTIONS, WR_RED_LEDS, WR_GREEN_LEDS, RD_SWITCHES, RD_PBUTTONS, RW_BATCH, BATCH_MAX
+from animation import RED_SWEEP, RED_INVERSE_SWEEP, GREEN_SWEEP, GREEN_INVERSE_SWEEP
+
+BATCH_STRUCT = struct.Struct(f'<II{2 * BATCH_MAX}I{BATCH_MAX}I')
+
+def seven_segment_table(base):
+    """Display words for 0 .. base**4 - 1, leading zeros blanked."""
+    blank = SEVEN_SEGMENT_OPTIONS["OFF"] * 0x01010100
+    table = array('I', (blank | SEVEN_SEGMENT_OPTIONS[digit] for digit in range(base)))
+    # n shows the digits of n // base shifted one place left, then its last digit
+    for num in range(base, base ** 4):
+        table.append((table[num // base] << 8 | SEVEN_SEGMENT_OPTIONS[num % base]) & 0xFFFFFFFF)
+    return table
+
+# Every value the 4-digit displays can show, encoded once at import
+SEVEN_SEGMENT_TABLE = seven_segment_table(10)
+SEVEN_SEGMENT_HEX_TABLE = seven_segment_table(16)
+
+def seven_segment_encoder(num, hex=False):
+    """Display word for num; values past the four digits saturate."""
+    if hex:
+        return SEVEN_SEGMENT_HEX_TABLE[min(num, 0xFFFF)]
+    return SEVEN_SEGMENT_TABLE[min(num, 9999)]
+
+def write_register(fd, register, value):
+    """Write a register; fd is a /dev/mydev descriptor or a hal.DeviceBackend."""
+    if isinstance(fd, int):
+        ioctl(fd, register)
+        return os.write(fd, value.to_bytes(4, 'little'))
+    fd.write(register, value)
+    return 4
+
+def read_register(fd, register):
+    """Read a register; fd is a /dev/mydev descriptor or a hal.DeviceBackend."""
+    if isinstance(fd, int):
+        ioctl(fd, register)
+        return int.from_bytes(os.read(fd, 4), 'little')
+    return fd.read(register)
 
 def seven_segment(fd, num, display, show_output_msg):
     data = seven_segment_encoder(num)
     
-    ioctl(fd, display)
-    retval = os.write(fd, data.to_bytes(4, 'little'))
+    retval = write_register(fd, display, data)
 
     if show_output_msg:
         print(f'>>> wrote {retval} bytes on seven segments!')
 
+def play_sequence(fd, register, table, delay=0.1):
+    for data in table:
+        write_register(fd, register, data)
+        sleep(delay)
+
 def red_leds(fd, on, inverse, sequence, show_output_msg):
     if sequence:
         if inverse:
-            data = 0b111111111111111111
+            play_sequence(fd, WR_RED_LEDS, RED_INVERSE_SWEEP)
             output_msg = '>>> red leds inverse sequence!'
-
-            for i in range(18, -1, -1):
-                ioctl(fd, WR_RED_LEDS)
-                os.write(fd, data.to_bytes(4,'little'))
-                sleep(0.1)
-                data_bin = bin(data)
-                data_bin = data_bin[2:]
-                data_bin = data_bin[:i] + '0' + data_bin[i+1:]
-                data_bin = '0b' + data_bin
-                data = int(data_bin, 2)
         else:
-            data = 0b111111111111111111
+            play_sequence(fd, WR_RED_LEDS, RED_SWEEP)
             output_msg = '>>> red leds sequence!'
-
-            for i in range(0, 18):
-                ioctl(fd, WR_RED_LEDS)
-                os.write(fd, data.to_bytes(4,'little'))
-                sleep(0.1)
-                data >>= 1
     else:
         if on:
             data = 0b111111111111111111
@@ -62,8 +71,7 @@ def red_leds(fd, on, inverse, sequence, show_output_msg):
             data = 0b000000000000000000
             output_msg = '>>> red leds off!'
 
-        ioctl(fd, WR_RED_LEDS)
-        os.write(fd, data.to_bytes(4, 'little'))
+        write_register(fd, WR_RED_LEDS, data)
     
     if show_output_msg:
         print(output_msg)
@@ -71,27 +79,11 @@ def red_leds(fd, on, inverse, sequence, show_output_msg):
 def green_leds(fd, on, inverse, sequence, show_output_msg):
     if sequence:
         if inverse:
-            data = 0b11111111
+            play_sequence(fd, WR_GREEN_LEDS, GREEN_INVERSE_SWEEP)
             output_msg = '>>> green leds inverse sequence!'
-
-            for i in range(18, -1, -1):
-                ioctl(fd, WR_GREEN_LEDS)
-                os.write(fd, data.to_bytes(4,'little'))
-                sleep(0.1)
-                data_bin = bin(data)
-                data_bin = data_bin[2:]
-                data_bin = data_bin[:i] + '0' + data_bin[i+1:]
-                data_bin = '0b' + data_bin
-                data = int(data_bin, 2)
         else:
-            data = 0b11111111       
+            play_sequence(fd, WR_GREEN_LEDS, GREEN_SWEEP)
             output_msg = '>>> green leds sequence!'
-
-            for i in range(0, 9):
-                ioctl(fd, WR_GREEN_LEDS)
-                os.write(fd, data.to_bytes(4,'little'))
-                sleep(0.1)
-                data >>= 1
     else:
         if on:
             data = 0b111111111
@@ -100,28 +92,47 @@ def green_leds(fd, on, inverse, sequence, show_output_msg):
             data = 0b000000000
             output_msg = '>>> green leds off!'
 
-        ioctl(fd, WR_GREEN_LEDS)
-        os.write(fd, data.to_bytes(4, 'little'))
+        write_register(fd, WR_GREEN_LEDS, data)
 
     if show_output_msg:
         print(output_msg)
 
 def read_button(fd, show_output_msg):
-    ioctl(fd, RD_PBUTTONS)
-    button = os.read(fd, 4)
-    button = bin(int.from_bytes(button, 'little'))
+    button = bin(read_register(fd, RD_PBUTTONS))
 
     if show_output_msg:
         print(f'>>> button {button}')
 
     return button
 
+def read_button_mask(fd):
+    return read_register(fd, RD_PBUTTONS)
+
 def read_switches(fd, show_output_msg):
-    ioctl(fd, RD_SWITCHES)
-    switches = os.read(fd, 4)
-    switches = bin(int.from_bytes(switches, 'little'))  
+    switches = bin(read_register(fd, RD_SWITCHES))
 
     if show_output_msg:
         print(f'>>> switches {switches}')
 
-    return switches
\ No newline at end of file
+    return switches
+
+def transfer(fd, writes, reads):
+    """Write (register, value) pairs, then read registers, in a single ioctl.
+
+    Registers are the WR_*/RD_* commands. Returns the values read, in order.
+    Raises ValueError when there are more than BATCH_MAX writes or reads.
+    """
+    if len(writes) > BATCH_MAX or len(reads) > BATCH_MAX:
+        raise ValueError(f'a transfer holds at most {BATCH_MAX} writes and {BATCH_MAX} reads, '
+                         f'got {len(writes)} and {len(reads)}')
+    words = [0] * (3 * BATCH_MAX)
+    for i, (register, value) in enumerate(writes):
+        words[2 * i] = register
+        words[2 * i + 1] = value
+    words[2 * BATCH_MAX:2 * BATCH_MAX + len(reads)] = reads
+    batch = bytearray(BATCH_STRUCT.pack(len(writes), len(reads), *words))
+
+    ioctl(fd, RW_BATCH, batch, True)
+
+    values = BATCH_STRUCT.unpack(batch)[2 + 2 * BATCH_MAX:]
+    return list(values[:len(reads)])
@@ -0,0 +1,109 @@
+"""Check the batch environment against scalar games, then measure its game-ticks per second.
+
+The check steps a BatchEnv and one scalar Game per batch game (same seed,
+SplitMix64 generator) with the same inputs, and compares the full state of
+every game, free cell order included, after every tick. It exits with status
+1 on the first difference. The inputs restart finished games and steer towards
+the resource around obstacles, so bosses get spawned and defeated.
+
+Run from the repository root:
+
+    python benchmarks/bench_batch.py [--games 1,64,1024,4096] [--ticks N]
+                                     [--check-games N] [--check-ticks N] [--seed S]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import numpy as np
+from pygame.math import Vector2
+from batch import BatchEnv, SplitMix64, game_snapshot, ACTIONS, BOOST, DIRECTIONS, GAME_OVER, NO_ACTION, NO_DIRECTION, PLAYING, START
+from bench_headless import random_inputs
+from game import Game, GameState, ScriptedInput
+
+VECTORS = [Vector2(dx, dy) for dx, dy in DIRECTIONS]
+
+def policy_inputs(env, rng):
+    """One tick of input codes for every game of env: head for the resource, avoiding blocked cells."""
+    n = env.n
+    head_y, head_x = np.divmod(env.head(np.arange(n)), env.size)
+    resource_y, resource_x = np.divmod(env.resource, env.size)
+    dx, dy = env.direction_table
+    cells = (head_y[:, None] + dy) % env.size * env.size + (head_x[:, None] + dx) % env.size
+    free = (env.blocking[np.arange(n)[:, None], cells] == 0) | (cells == env.resource[:, None])
+    toward = (dx * np.sign(resource_x - head_x)[:, None] > 0) | (dy * np.sign(resource_y - head_y)[:, None] > 0)
+    reverse = (dx == -env.dx[:, None]) & (dy == -env.dy[:, None])
+    preference = 2 * free + toward - 4 * reverse + rng.random((n, 4))
+    directions = np.where(rng.random(n) < 0.9, preference.argmax(axis=1), NO_DIRECTION)
+    actions = np.where(rng.random(n) < 0.02, BOOST, NO_ACTION)
+    actions[env.state != PLAYING] = START
+    return directions, actions
+
+def check(n_games, ticks, seed):
+    env = BatchEnv(n_games, seed)
+    games = [Game(ScriptedInput(), headless=True, seed=seed + i, rng=SplitMix64(seed + i)) for i in range(n_games)]
+    rng = np.random.default_rng(seed)
+    game_overs = bosses = defeats = 0
+    for _ in range(ticks):
+        directions, actions = policy_inputs(env, rng)
+        for i, game in enumerate(games):
+            # BatchEnv drops the directions given to a game that is not playing
+            direction = VECTORS[directions[i]] if directions[i] >= 0 and game.state == GameState.PLAYING else None
+            game.input_handler.push(direction, ACTIONS[actions[i]])
+            game.update()
+        was_over, had_boss, spawn_score = env.state == GAME_OVER, env.boss_alive.copy(), env.boss_spawn_score.copy()
+        env.step(directions, actions)
+        game_overs += int(((env.state == GAME_OVER) & ~was_over).sum())
+        bosses += int((env.boss_alive & ~had_boss).sum())
+        defeats += int((env.boss_spawn_score > spawn_score).sum())
+        for i, game in enumerate(games):
+            expected, actual = game_snapshot(game), env.snapshot(i)
+            if expected != actual:
+                print(f'game {i} differs after tick {game.tick}:')
+                print(f'  Game     {expected}')
+                print(f'  BatchEnv {actual}')
+                return False
+    print(f'{n_games} games x {ticks} ticks match the scalar Game '
+          f'({game_overs} game overs, {bosses} bosses spawned, {defeats} defeated)')
+    return True
+
+def batch_rate(n_games, ticks, seed):
+    env = BatchEnv(n_games, seed)
+    rng = np.random.default_rng(seed)
+    elapsed = 0.0
+    for _ in range(ticks):
+        directions, actions = policy_inputs(env, rng)
+        start = time.perf_counter()
+        env.step(directions, actions)
+        elapsed += time.perf_counter() - start
+    return n_games * ticks / elapsed
+
+def scalar_rate(ticks, seed):
+    game = Game(ScriptedInput(), headless=True, seed=seed)
+    start = time.perf_counter()
+    game.step(ticks, random_inputs(game, random.Random(seed)))
+    return ticks / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', default='1,64,1024,4096', help='comma separated batch sizes')
+    parser.add_argument('--ticks', type=int, default=500)
+    parser.add_argument('--check-games', type=int, default=32)
+    parser.add_argument('--check-ticks', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not check(args.check_games, args.check_ticks, args.seed):
+        sys.exit(1)
+    scalar = scalar_rate(20_000, args.seed)
+    print(f'scalar Game      {scalar:>12,.0f} game-ticks/sec')
+    for n_games in map(int, args.games.split(',')):
+        rate = batch_rate(n_games, args.ticks, args.seed)
+        print(f'BatchEnv n={n_games:<5} {rate:>12,.0f} game-ticks/sec ({rate / scalar:6.1f}x)')
+
+if __name__ == '__main__':
+    main()
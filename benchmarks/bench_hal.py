@@ -0,0 +1,124 @@
+"""Compare per-frame syscalls of direct register access and DeviceHAL batching.
+
+First checks that utils.transfer() packs the RW_BATCH struct the way the
+driver reads it: a fake ioctl unpacks the buffer, applies the writes to a
+FakeDevice and fills in the reads. It exits with status 1 on a mismatch.
+
+Run from the repository root:
+
+    python benchmarks/bench_hal.py [--frames N] [--latency PRESET]
+"""
+import argparse
+import errno
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import utils
+from constants import WR_RED_LEDS, WR_GREEN_LEDS, WR_L_DISPLAY, WR_R_DISPLAY, RD_SWITCHES, RD_PBUTTONS, RW_BATCH, BATCH_MAX
+from fake_device import FakeDevice, LATENCY_PRESETS
+from hal import DeviceHAL
+from utils import seven_segment_encoder, BATCH_STRUCT
+
+WRITE_REGISTERS = (WR_RED_LEDS, WR_GREEN_LEDS, WR_L_DISPLAY, WR_R_DISPLAY)
+READ_REGISTERS = (RD_SWITCHES, RD_PBUTTONS)
+
+def frame_outputs(frame):
+    # Score changes every 60 frames, LEDs blink every 30, high score never changes
+    score = frame // 60
+    leds = 0b111111111111111111 if frame // 30 % 2 else 0
+    return {
+        WR_RED_LEDS: leds,
+        WR_GREEN_LEDS: 0b11111111,
+        WR_L_DISPLAY: seven_segment_encoder(score),
+        WR_R_DISPLAY: seven_segment_encoder(42),
+    }
+
+def fake_ioctl(device):
+    """An ioctl() doing what the driver's RW_BATCH does, on a FakeDevice."""
+    def ioctl(fd, request, batch, mutate):
+        assert request == RW_BATCH and mutate
+        words = list(BATCH_STRUCT.unpack(batch))
+        n_writes, n_reads = words[:2]
+        if n_writes > BATCH_MAX or n_reads > BATCH_MAX:
+            raise OSError(errno.EINVAL, 'RW_BATCH count over BATCH_MAX')
+        pairs = words[2:2 + 2 * BATCH_MAX]
+        reads = words[2 + 2 * BATCH_MAX:]
+        for i in range(n_writes):
+            device.write(pairs[2 * i], pairs[2 * i + 1])
+        reads[:n_reads] = [device.read(register) for register in reads[:n_reads]]
+        batch[:] = BATCH_STRUCT.pack(n_writes, n_reads, *pairs, *reads)
+    return ioctl
+
+def check_transfer(rounds=1000):
+    """Round-trip random batches through transfer() and a fake ioctl; False on a mismatch."""
+    device = FakeDevice()
+    rng = random.Random(0)
+    real_ioctl = utils.ioctl
+    utils.ioctl = fake_ioctl(device)
+    try:
+        for _ in range(rounds):
+            writes = [(rng.choice(WRITE_REGISTERS), rng.getrandbits(32)) for _ in range(rng.randint(0, BATCH_MAX))]
+            reads = [rng.choice(READ_REGISTERS) for _ in range(rng.randint(0, BATCH_MAX))]
+            device.set_switches(rng.getrandbits(18))
+            expected_reads = [device.register(register) for register in reads]
+            # The last write to a register is the one that sticks
+            expected_writes = dict(writes)
+            values = utils.transfer(None, writes, reads)
+            written = {register: device.register(register) for register in expected_writes}
+            if values != expected_reads or written != expected_writes:
+                print(f'transfer({writes}, {reads}) read {values} and left {written}')
+                return False
+        for writes, reads in (([(WR_RED_LEDS, 0)] * (BATCH_MAX + 1), []), ([], [RD_SWITCHES] * (BATCH_MAX + 1))):
+            try:
+                utils.transfer(None, writes, reads)
+            except ValueError:
+                continue
+            except OSError:
+                pass
+            print(f'transfer() packed {len(writes)} writes and {len(reads)} reads instead of raising ValueError')
+            return False
+    finally:
+        utils.ioctl = real_ioctl
+    print(f'{rounds} batched transfers round-trip through the RW_BATCH struct')
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=6000)
+    parser.add_argument('--latency', choices=LATENCY_PRESETS, default='none', help='modelled cost of each syscall')
+    args = parser.parse_args()
+    latency = LATENCY_PRESETS[args.latency]
+
+    if not check_transfer():
+        sys.exit(1)
+
+    # Every frame writes all outputs and reads switches and buttons
+    direct = FakeDevice(latency)
+    start = time.perf_counter()
+    for frame in range(args.frames):
+        for register, value in frame_outputs(frame).items():
+            direct.write(register, value)
+        direct.read(RD_SWITCHES)
+        direct.read(RD_PBUTTONS)
+    direct_time = time.perf_counter() - start
+
+    # Only changed outputs are written, in one transfer with the reads
+    hal = DeviceHAL(FakeDevice(latency))
+    start = time.perf_counter()
+    for frame in range(args.frames):
+        for register, value in frame_outputs(frame).items():
+            hal.set(register, value)
+        hal.end_frame(reads=(RD_SWITCHES, RD_PBUTTONS))
+    hal_time = time.perf_counter() - start
+
+    print(f'direct access: {direct.syscalls / args.frames:.2f} syscalls/frame, '
+          f'{direct_time / args.frames * 1e6:.1f} us/frame')
+    print(f'DeviceHAL:     {hal.backend.syscalls / args.frames:.2f} syscalls/frame, '
+          f'{hal_time / args.frames * 1e6:.1f} us/frame ({hal.skipped_writes} redundant writes skipped)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Measure headless simulation throughput in ticks per second.
+
+Run from the repository root:
+
+    python benchmarks/bench_headless.py [--ticks N] [--seed S]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from pygame.math import Vector2
+from game import Game, GameState, ScriptedInput
+
+DIRECTIONS = [Vector2(0, -1), Vector2(0, 1), Vector2(-1, 0), Vector2(1, 0)]
+
+def random_inputs(game, rng):
+    # Restart as soon as the ship dies so the whole run is spent playing
+    while True:
+        if game.state != GameState.PLAYING:
+            yield None, "START"
+        elif rng.random() < 0.2:
+            yield rng.choice(DIRECTIONS), "BOOST" if rng.random() < 0.05 else None
+        else:
+            yield None, None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    game = Game(ScriptedInput(), headless=True, seed=args.seed)
+    inputs = random_inputs(game, random.Random(args.seed))
+
+    start = time.perf_counter()
+    game.step(args.ticks, inputs)
+    elapsed = time.perf_counter() - start
+
+    print(f'{args.ticks} ticks in {elapsed:.3f}s -> {args.ticks / elapsed:,.0f} ticks/sec')
+
+if __name__ == '__main__':
+    main()
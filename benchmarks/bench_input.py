@@ -0,0 +1,51 @@
+"""Measure button press detection and latency of ButtonPoller against a fake device.
+
+Run from the repository root:
+
+    python benchmarks/bench_input.py [--presses N] [--rate HZ]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from fake_device import FakeDevice
+from poller import ButtonPoller
+
+DURATIONS_MS = (2, 20, 100, 250)
+NAMES = ("UP", "DOWN", "LEFT", "RIGHT")
+FRAME = 1 / 60
+
+def run(duration_ms, presses, rate_hz):
+    device = FakeDevice()
+    poller = ButtonPoller(device.read_buttons, rate_hz=rate_hz)
+    poller.start()
+    detected = 0
+    for _ in range(presses):
+        device.press(random.choice(NAMES))
+        threading.Timer(duration_ms / 1000, device.release).start()
+        # Drain like the game loop does, once per 60 Hz frame
+        for _ in range(int((duration_ms / 1000 + 0.05) / FRAME) + 1):
+            time.sleep(FRAME)
+            detected += sum(event.pressed for event in poller.drain())
+    poller.stop()
+    return detected, poller.stats()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--presses', type=int, default=20)
+    parser.add_argument('--rate', type=int, default=1000)
+    args = parser.parse_args()
+
+    for duration_ms in DURATIONS_MS:
+        detected, stats = run(duration_ms, args.presses, args.rate)
+        print(f'{duration_ms:>4} ms presses: {detected}/{args.presses} detected, {args.presses - detected} missed, '
+              f'{stats["sample_rate_hz"]} Hz, rejected rate {stats["rejected_rate"]}, '
+              f'latency mean {stats["latency_ms_mean"]} ms, p95 {stats["latency_ms_p95"]} ms')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Compare register ops/sec of the ioctl path and the mmap path.
+
+Run from the repository root:
+
+    python benchmarks/bench_mmio.py [--ops N]
+
+With /dev/mydev available both backends drive the board. Without it the
+mmap backend runs against a memfd laid out like the register window. The
+ioctl path is then approximated by a seek + read/write pair on the same
+memfd, which costs the same two syscalls per access.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from constants import PATH, MMAP_WINDOW_SIZE, REGISTER_OFFSETS, RD_SWITCHES, WR_RED_LEDS
+from hal import IoctlBackend
+from mmio import MmapBackend
+
+class SyscallPairBackend:
+    """Two syscalls per access, standing in for ioctl + read/write."""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.syscalls = 0
+
+    def read(self, register):
+        os.lseek(self.fd, REGISTER_OFFSETS[register], os.SEEK_SET)
+        self.syscalls += 2
+        return int.from_bytes(os.read(self.fd, 4), 'little')
+
+    def write(self, register, value):
+        os.lseek(self.fd, REGISTER_OFFSETS[register], os.SEEK_SET)
+        self.syscalls += 2
+        os.write(self.fd, value.to_bytes(4, 'little'))
+
+def ops_per_sec(backend, ops):
+    start = time.perf_counter()
+    for i in range(ops // 2):
+        backend.write(WR_RED_LEDS, i)
+        backend.read(RD_SWITCHES)
+    return ops / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=200_000)
+    args = parser.parse_args()
+
+    if os.access(PATH, os.R_OK | os.W_OK):
+        fd = os.open(PATH, os.O_RDWR)
+        slow, label = IoctlBackend(fd), 'ioctl + read/write'
+    else:
+        fd = os.memfd_create('de2i-150-registers')
+        os.ftruncate(fd, MMAP_WINDOW_SIZE)
+        slow, label = SyscallPairBackend(fd), 'seek + read/write (memfd)'
+    fast = MmapBackend(fd)
+
+    slow_rate = ops_per_sec(slow, args.ops)
+    fast_rate = ops_per_sec(fast, args.ops)
+    print(f'{label:>28}: {slow_rate:>12,.0f} ops/sec')
+    print(f'{"mmap + memoryview":>28}: {fast_rate:>12,.0f} ops/sec ({fast_rate / slow_rate:.1f}x)')
+
+    fast.close()
+    os.close(fd)
+
+if __name__ == '__main__':
+    main()
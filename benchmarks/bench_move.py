@@ -0,0 +1,62 @@
+"""Compare the list-based Spaceship.move against the ring-buffer one.
+
+Run from the repository root:
+
+    python benchmarks/bench_move.py [--moves N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from pygame.math import Vector2
+from board import OccupancyGrid, CellRing, SHIP
+from game import Spaceship, CELL_NUMBER
+
+LENGTHS = (10, 1_000, 100_000)
+
+def legacy_move(body, direction):
+    # Spaceship.move before the ring buffer: two list copies per step
+    body_copy = body[:-1]
+    body_copy.insert(0, body_copy[0] + direction)
+    body = body_copy[:]
+    body[0].x %= CELL_NUMBER
+    body[0].y %= CELL_NUMBER
+    return body
+
+def bench_legacy(length, moves):
+    body = [Vector2(i % CELL_NUMBER, 0) for i in range(length)]
+    direction = Vector2(1, 0)
+    start = time.perf_counter()
+    for _ in range(moves):
+        body = legacy_move(body, direction)
+    return (time.perf_counter() - start) / moves
+
+def bench_ring(length, moves):
+    grid = OccupancyGrid(CELL_NUMBER)
+    ship = Spaceship(grid)
+    for cell in ship.body:
+        grid.remove(SHIP, cell)
+    ship.body = CellRing([i % CELL_NUMBER for i in range(length)])
+    for cell in ship.body:
+        grid.add(SHIP, cell)
+    start = time.perf_counter()
+    for _ in range(moves):
+        ship.move()
+    return (time.perf_counter() - start) / moves
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--moves', type=int, default=1_000)
+    args = parser.parse_args()
+
+    print(f'{"length":>8} {"list (us)":>12} {"ring (us)":>12} {"speedup":>8}')
+    for length in LENGTHS:
+        legacy = bench_legacy(length, args.moves)
+        ring = bench_ring(length, args.moves)
+        print(f'{length:>8} {legacy * 1e6:>12.2f} {ring * 1e6:>12.2f} {legacy / ring:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
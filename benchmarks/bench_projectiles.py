@@ -0,0 +1,60 @@
+"""Measure the per-tick cost of boss projectiles, NumPy buffer against plain lists.
+
+Each run fills a large board with ring volleys fired from random points and
+times step() plus the viewport culling done when drawing, per tick.
+
+Run from the repository root:
+
+    python benchmarks/bench_projectiles.py [--counts 100,1000,10000,50000] [--ticks N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from board import OccupancyGrid
+from projectiles import ProjectileBuffer, ProjectileList, pattern_velocities, np
+from render import Camera
+
+WORLD = 2000
+FRAME_BUDGET_MS = 1000 / 60
+
+def tick_time(buffer_class, count, ticks):
+    grid = OccupancyGrid(WORLD)
+    projectiles = buffer_class(grid)
+    rng = random.Random(0)
+    volley = pattern_velocities('ring', 100, 0.5)
+    for _ in range(count // len(volley)):
+        # Far enough from the edges that no projectile leaves the board during the run
+        projectiles.spawn(rng.uniform(WORLD / 4, WORLD * 3 / 4), rng.uniform(WORLD / 4, WORLD * 3 / 4), volley)
+    camera = Camera(WORLD, 15, 60)
+    camera.x = camera.y = WORLD // 2 - 7
+    start = time.perf_counter()
+    for _ in range(ticks):
+        projectiles.step()
+        for _ in projectiles.visible(camera, 0.5):
+            pass
+    return (time.perf_counter() - start) / ticks * 1e3
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', default='100,1000,10000,50000', help='comma separated projectile counts')
+    parser.add_argument('--ticks', type=int, default=200)
+    args = parser.parse_args()
+
+    if np is None:
+        print('NumPy is not installed; only the list fallback is measured')
+    for count in map(int, args.counts.split(',')):
+        results = []
+        for buffer_class in (ProjectileBuffer, ProjectileList):
+            if buffer_class is ProjectileBuffer and np is None:
+                continue
+            ms = tick_time(buffer_class, count, args.ticks)
+            results.append(f'{buffer_class.__name__} {ms:8.3f} ms/tick ({ms / FRAME_BUDGET_MS:6.1%} of a frame)')
+        print(f'{count:>6} projectiles  ' + '  '.join(results))
+
+if __name__ == '__main__':
+    main()
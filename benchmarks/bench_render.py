@@ -0,0 +1,80 @@
+"""Compare the draw cost of the rect and cell-array renderers as the board fills up.
+
+Each case puts the ship, the given number of asteroids and a boss with the
+given number of projectiles on the board, then times game.draw() with the
+rect renderer (dirty rects and full redraws) and with the cell-array one.
+
+Run from the repository root:
+
+    python benchmarks/bench_render.py [--frames N]
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import pygame
+from game import Game, GameState, ScriptedInput, Boss, SCREEN_SIZE, VIEW_CELLS
+from projectiles import pattern_velocities
+from render import DirtyRectRenderer, CellArrayRenderer, np
+from suite import ROUTE, TURNS, setup
+
+# (asteroids, projectiles) on the board
+CASES = ((5, 0), (50, 0), (150, 0), (50, 100), (50, 1000))
+
+def fill(game, asteroids, projectiles):
+    head = setup(game, 30, asteroids)
+    game.boss = Boss(game.grid)
+    volley = pattern_velocities('ring', 50, 0.01)
+    for _ in range(projectiles // len(volley)):
+        game.boss.projectiles.spawn(game.boss.pos.x + 2, game.boss.pos.y + 2, volley)
+    # Spread the volleys apart so they cover many cells
+    for _ in range(200):
+        game.boss.update_projectiles()
+    return head
+
+RENDERERS = {
+    'rects': DirtyRectRenderer,
+    'array': lambda background: CellArrayRenderer(background, VIEW_CELLS),
+}
+
+def draw_time(screen, renderer, full_redraw, case, frames):
+    game = Game(ScriptedInput(), headless=True, seed=0)
+    head = fill(game, *case)
+    game.renderer = RENDERERS[renderer](game.render_background(screen))
+    game.grid.changed = set()
+    elapsed = 0.0
+    for frame in range(frames):
+        # A tick every four frames; the asteroids and boss stay put
+        if frame % 4 == 0 and game.state == GameState.PLAYING:
+            game.spaceship.set_direction(TURNS[head])
+            game.spaceship.move()
+            head = (head + 1) % len(ROUTE)
+        if full_redraw:
+            game.renderer.invalidate()
+        start = time.perf_counter()
+        game.draw(screen, (frame % 4) / 4)
+        elapsed += time.perf_counter() - start
+    return elapsed / frames * 1e3
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=600)
+    args = parser.parse_args()
+
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
+    for case in CASES:
+        results = [f'rects dirty {draw_time(screen, "rects", False, case, args.frames):6.3f}',
+                   f'rects full {draw_time(screen, "rects", True, case, args.frames):6.3f}']
+        if np is not None:
+            results.append(f'array {draw_time(screen, "array", False, case, args.frames):6.3f}')
+        print(f'{case[0]:>4} asteroids {case[1]:>5} projectiles  ' + '  '.join(results) + '  ms/frame')
+    pygame.quit()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Measure frame and tick cost as the world grows around a fixed-size view.
+
+Every world size runs in its own process, on a copy of config.json with that
+world_size and an asteroid count proportional to its area. With viewport
+culling the draw times should stay flat while the world grows.
+
+Run from the repository root:
+
+    python benchmarks/bench_world.py [--worlds 15,100,1000] [--density 0.005] [--frames N]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+sys.path.insert(0, APP)
+
+def measure(frames, ticks):
+    # Imported here so the config of the child process is the one loaded
+    import pygame
+    from bench_headless import random_inputs
+    from game import Game, GameState, ScriptedInput, CELL_NUMBER, SCREEN_SIZE
+
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
+    results = [f'world {CELL_NUMBER:>5}x{CELL_NUMBER:<5}']
+    for full_redraw in (False, True):
+        game = Game(ScriptedInput(), headless=True, seed=0)
+        inputs = random_inputs(game, random.Random(0))
+        game.draw(screen)
+        elapsed = 0.0
+        for frame in range(frames):
+            # A tick every four frames, with interpolation in between
+            if frame % 4 == 0:
+                game.step(1, inputs)
+            if full_redraw:
+                game.renderer.invalidate()
+            start = time.perf_counter()
+            game.draw(screen, (frame % 4) / 4)
+            elapsed += time.perf_counter() - start
+        results.append(f'{"full" if full_redraw else "dirty"} {elapsed / frames * 1e3:6.3f} ms/frame')
+    results.append(f'asteroids {len(game.asteroids):>6}')
+
+    # Restarts respawn every asteroid, so they are timed apart from play
+    game = Game(ScriptedInput(), headless=True, seed=0)
+    inputs = random_inputs(game, random.Random(0))
+    playing = restarting = 0.0
+    restarts = 0
+    for _ in range(ticks):
+        was_playing = game.state == GameState.PLAYING
+        start = time.perf_counter()
+        game.step(1, inputs)
+        elapsed = time.perf_counter() - start
+        if was_playing:
+            playing += elapsed
+        else:
+            restarting += elapsed
+            restarts += 1
+    results.append(f'update {(ticks - restarts) / playing:>9,.0f} ticks/s')
+    results.append(f'restart {restarting / max(1, restarts) * 1e3:7.3f} ms')
+    pygame.quit()
+    print('  '.join(results))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--worlds', default='15,100,1000', help='comma separated world sizes')
+    parser.add_argument('--density', type=float, default=0.005, help='asteroids per cell')
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--ticks', type=int, default=20_000)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.frames, args.ticks)
+        return
+
+    with open(os.path.join(APP, '..', 'config.json')) as f:
+        config = json.load(f)
+    for world in map(int, args.worlds.split(',')):
+        config['game_settings']['world_size'] = world
+        config['game_settings']['initial_asteroids'] = max(5, int(world * world * args.density))
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(config, f)
+        try:
+            subprocess.run([sys.executable, __file__, '--child', '--frames', str(args.frames), '--ticks', str(args.ticks)],
+                           env=dict(os.environ, SPACE_SNAKE_CONFIG=f.name), check=True)
+        finally:
+            os.remove(f.name)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Benchmark the simulation, rendering and device I/O hot paths.
+
+Run from the repository root:
+
+    python benchmarks/suite.py run [--out results.json] [--repeat N] [--quick]
+    python benchmarks/suite.py compare base.json new.json [--threshold 0.1]
+
+run writes every measurement to JSON (and prints it). compare lists the
+change of every benchmark present in both files and exits with status 1
+when any of them got worse by more than the threshold (0.1 = 10%).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import pygame
+from pygame.math import Vector2
+from bench_projectiles import tick_time as projectile_tick_time
+from board import CellRing, SHIP
+from constants import RD_SWITCHES, WR_RED_LEDS
+from fake_device import FakeDevice
+from game import Game, GameState, ScriptedInput, Asteroid, CELL_NUMBER, SCREEN_SIZE, VIEW_CELLS
+from hal import DeviceHAL
+from projectiles import ProjectileBuffer, ProjectileList, np
+from render import CellArrayRenderer
+from utils import seven_segment_encoder, red_leds, green_leds, read_switches, read_button
+
+SNAKE_LENGTHS = (3, 30, 100)
+ASTEROID_COUNTS = (5, 20, 60)
+
+def route():
+    """A cycle over every cell of the wrapped board: right along a row, then one down.
+
+    A ship following it never runs into its own body, whatever its length.
+    """
+    cells = []
+    x = 0
+    for y in range(CELL_NUMBER):
+        cells.extend(y * CELL_NUMBER + (x + i) % CELL_NUMBER for i in range(CELL_NUMBER))
+        x = (x + CELL_NUMBER - 1) % CELL_NUMBER
+    turns = [Vector2(0, 1) if i % CELL_NUMBER == CELL_NUMBER - 1 else Vector2(1, 0) for i in range(len(cells))]
+    return cells, turns
+
+ROUTE, TURNS = route()
+
+def setup(game, length, asteroids):
+    """Put game in PLAYING with a ship of the given length on the route."""
+    game.start_game()
+    grid = game.grid
+    ship = game.spaceship
+    for cell in ship.body:
+        grid.remove(SHIP, cell)
+    for asteroid in game.asteroids:
+        asteroid.remove()
+    ship.body = CellRing(ROUTE[length - 1::-1])
+    for cell in ship.body:
+        grid.add(SHIP, cell)
+    ship.prev_head = ship.body[0]
+    game.resource.randomize()
+    game.asteroids = [Asteroid(grid) for _ in range(asteroids)]
+    # The route index of the head, used to pick the next turn
+    return length - 1
+
+def update_rate(length, asteroids, ticks):
+    # Same spawns and restarts on every run
+    game = Game(ScriptedInput(), headless=True, seed=0)
+    head = setup(game, length, asteroids)
+    elapsed = 0.0
+    done = 0
+    while done < ticks:
+        if game.state != GameState.PLAYING:
+            head = setup(game, length, asteroids)
+        game.input_handler.push(TURNS[head])
+        start = time.perf_counter()
+        game.update()
+        elapsed += time.perf_counter() - start
+        head = (head + 1) % len(ROUTE)
+        done += 1
+    return ticks / elapsed
+
+def draw_time(full_redraw, frames, cell_array=False):
+    screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
+    game = Game(ScriptedInput(), headless=True, seed=0)
+    head = setup(game, 30, 20)
+    if cell_array:
+        game.renderer = CellArrayRenderer(game.render_background(screen), VIEW_CELLS)
+        game.grid.changed = set()
+    game.draw(screen)
+    elapsed = 0.0
+    for frame in range(frames):
+        # A tick every four frames, with interpolation in between
+        if frame % 4 == 0:
+            if game.state != GameState.PLAYING:
+                head = setup(game, 30, 20)
+            game.input_handler.push(TURNS[head])
+            game.update()
+            head = (head + 1) % len(ROUTE)
+        if full_redraw:
+            game.renderer.invalidate()
+        start = time.perf_counter()
+        game.draw(screen, (frame % 4) / 4)
+        elapsed += time.perf_counter() - start
+    return elapsed / frames * 1e3
+
+def encoder_rate(calls):
+    values = [num % 10000 for num in range(calls)]
+    start = time.perf_counter()
+    for num in values:
+        seven_segment_encoder(num)
+    return calls / (time.perf_counter() - start)
+
+def helper_rate(helper, calls):
+    device = FakeDevice()
+    start = time.perf_counter()
+    for _ in range(calls):
+        helper(device)
+    elapsed = time.perf_counter() - start
+    return calls / elapsed, device.syscalls / calls
+
+def hal_frame_rate(frames):
+    hal = DeviceHAL(FakeDevice())
+    start = time.perf_counter()
+    for frame in range(frames):
+        hal.set(WR_RED_LEDS, frame // 30 % 2)
+        hal.end_frame(reads=(RD_SWITCHES,))
+    elapsed = time.perf_counter() - start
+    return frames / elapsed, hal.backend.syscalls / frames
+
+HELPERS = {
+    'red_leds': lambda device: red_leds(device, True, False, False, False),
+    'green_leds': lambda device: green_leds(device, False, False, False, False),
+    'read_switches': lambda device: read_switches(device, False),
+    'read_button': lambda device: read_button(device, False),
+}
+
+def measure(scale):
+    """Yield (name, value, unit, higher_is_better) for every benchmark."""
+    for length in SNAKE_LENGTHS:
+        for asteroids in ASTEROID_COUNTS:
+            yield (f'update/length={length}/asteroids={asteroids}',
+                   update_rate(length, asteroids, 20_000 // scale), 'ticks/s', True)
+    yield 'draw/dirty', draw_time(False, 600 // scale), 'ms/frame', False
+    yield 'draw/full', draw_time(True, 600 // scale), 'ms/frame', False
+    if np is not None:
+        yield 'draw/array', draw_time(False, 600 // scale, cell_array=True), 'ms/frame', False
+    buffer_class = ProjectileBuffer if np is not None else ProjectileList
+    yield 'projectiles/n=10000', projectile_tick_time(buffer_class, 10_000, 200 // scale), 'ms/tick', False
+    if np is not None:
+        # bench_batch needs NumPy, so it is only imported when it is there
+        from bench_batch import batch_rate
+        yield 'batch/n=4096', batch_rate(4096, 200 // scale, 0), 'game-ticks/s', True
+    yield 'seven_segment_encoder', encoder_rate(200_000 // scale), 'calls/s', True
+    for name, helper in HELPERS.items():
+        rate, syscalls = helper_rate(helper, 50_000 // scale)
+        yield f'io/{name}', rate, 'calls/s', True
+        yield f'io/{name}/syscalls', syscalls, 'syscalls/call', False
+    rate, syscalls = hal_frame_rate(50_000 // scale)
+    yield 'io/hal_frame', rate, 'frames/s', True
+    yield 'io/hal_frame/syscalls', syscalls, 'syscalls/frame', False
+
+def run(args):
+    pygame.display.init()
+    pygame.font.init()
+    scale = 10 if args.quick else 1
+    best = {}
+    for _ in range(args.repeat):
+        for name, value, unit, higher_is_better in measure(scale):
+            previous = best.get(name)
+            if previous is None or (value > previous['value']) == higher_is_better:
+                best[name] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+    pygame.quit()
+
+    for name, result in best.items():
+        print(f'{name:<40} {result["value"]:>14,.3f} {result["unit"]}')
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'quick': args.quick,
+        },
+        'results': best,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'results written to {args.out}')
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)['results']
+    with open(args.new) as f:
+        new = json.load(f)['results']
+
+    regressions = 0
+    for name, result in new.items():
+        if name not in base or not base[name]['value']:
+            continue
+        change = (result['value'] - base[name]['value']) / base[name]['value']
+        worse = -change if result['higher_is_better'] else change
+        flag = ''
+        if worse > args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f'{name:<40} {base[name]["value"]:>14,.3f} -> {result["value"]:>14,.3f} '
+              f'{result["unit"]:<14} {change:+8.1%}{flag}')
+
+    print(f'{regressions} regression(s) beyond {args.threshold:.0%}')
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmarks and write JSON')
+    run_parser.add_argument('--out', default='bench_results.json')
+    run_parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, the best is kept')
+    run_parser.add_argument('--quick', action='store_true', help='a tenth of the iterations')
+    compare_parser = commands.add_parser('compare', help='flag regressions between two runs')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+if __name__ == '__main__':
+    main()
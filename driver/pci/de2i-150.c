@@ -7,6 +7,14 @@
 #include <linux/cdev.h>		/* char device registration */
 #include <linux/uaccess.h>	/* copy_*_user functions */
 #include <linux/pci.h>		/* pci funcs and types */
+#include <linux/mm.h>		/* remap of MMIO pages to userspace */
+#include <linux/poll.h>		/* poll syscall */
+#include <linux/wait.h>		/* wait queues */
+#include <linux/timer.h>	/* periodic input sampling */
+#include <linux/slab.h>		/* kzalloc */
+#include <linux/spinlock.h>	/* event state lock */
+#include <linux/moduleparam.h>	/* sample_ms parameter */
+#include <linux/mutex.h>	/* per file state lock */
 
 #include "../../include/ioctl_cmds.h"
 
@@ -24,6 +32,10 @@ MODULE_DESCRIPTION("simple pci driver for DE2i-150 dev board");
 #define MY_PCI_VENDOR_ID  0x1172
 #define MY_PCI_DEVICE_ID  0x0004
 
+/* BAR0 page holding the peripherals (offsets 0xC040 to 0xC160) */
+#define PERIPH_WINDOW_OFFSET 0xC000
+#define PERIPH_WINDOW_SIZE   PAGE_SIZE
+
 /* lkm entry and exit functions */
 
 static int  __init my_init (void);
@@ -36,6 +48,8 @@ static int 	my_close  (struct inode*, struct file*);
 static ssize_t 	my_read   (struct file*, char __user*, size_t, loff_t*);
 static ssize_t 	my_write  (struct file*, const char __user*, size_t, loff_t*);
 static long int	my_ioctl  (struct file*, unsigned int, unsigned long);
+static int	my_mmap   (struct file*, struct vm_area_struct*);
+static __poll_t	my_poll   (struct file*, struct poll_table_struct*);
 
 /* pci functions */
 
@@ -57,6 +71,8 @@ static struct file_operations fops = {
 	.read = my_read,
 	.write = my_write,
 	.unlocked_ioctl	= my_ioctl,
+	.mmap = my_mmap,
+	.poll = my_poll,
 	.open = my_open,
 	.release = my_close
 };
@@ -80,9 +96,8 @@ static struct cdev my_device;
 /* PCI BARs mapped to virtual space */
 static void __iomem* bar0_mmio = NULL;
 
-/* MMIO pointers used in write() read() ioctl() */
-static void __iomem* read_pointer  = NULL;
-static void __iomem* write_pointer = NULL;
+/* BAR0 physical address, used to map the peripherals page to userspace */
+static resource_size_t bar0_start = 0;
 
 /* peripherals names for debugging in dmesg */
 static const char* peripheral[] = {
@@ -102,8 +117,43 @@ enum perf_names_idx {
 	IDX_GREENLED,
 	IDX_REDLED
 };
-static int wr_name_idx = IDX_DISPLAYR;
-static int rd_name_idx = IDX_SWITCH;
+
+/* --- input change events --- */
+/* switches and buttons are sampled by a timer and every change is queued in
+ * event_ring, so a press and release between two reads are both delivered */
+static unsigned int sample_ms = 5;
+module_param(sample_ms, uint, 0444);
+MODULE_PARM_DESC(sample_ms, "switches/buttons sampling period in ms");
+
+struct input_event_data {
+	u32 switches;
+	u32 buttons;
+};
+
+static struct timer_list sample_timer;
+static DECLARE_WAIT_QUEUE_HEAD(event_wq);
+static DEFINE_SPINLOCK(event_lock);
+/* the last EVENT_QUEUE_LEN states; event_seq counts every state queued, the
+ * newest sits at event_ring[(event_seq - 1) & EVENT_QUEUE_MASK] */
+#define EVENT_QUEUE_LEN  64
+#define EVENT_QUEUE_MASK (EVENT_QUEUE_LEN - 1)
+static struct input_event_data event_ring[EVENT_QUEUE_LEN];
+static unsigned int event_seq = 0;
+
+/* per open file state, so processes sharing the device cannot retarget
+ * each other's register between ioctl() and read()/write() */
+struct my_file {
+	struct mutex lock;
+
+	/* MMIO pointers selected by ioctl() and used in read() write() */
+	void __iomem* read_pointer;
+	void __iomem* write_pointer;
+	int rd_name_idx;
+	int wr_name_idx;
+
+	int events;		/* read() returns change events instead of a register */
+	unsigned int seen_seq;	/* event_seq of the next state delivered to this file */
+};
 
 /* functions implementation */
 
@@ -169,21 +219,81 @@ static void __exit my_exit(void)
 
 static int my_open(struct inode* inode, struct file* filp)
 {
+	struct my_file* priv = kzalloc(sizeof(*priv), GFP_KERNEL);
+
+	if (priv == NULL)
+		return -ENOMEM;
+
+	/* initialize a default peripheral read and write pointer */
+	mutex_init(&priv->lock);
+	if (bar0_mmio != NULL) {
+		priv->write_pointer = bar0_mmio + 0xC040;
+		priv->read_pointer  = bar0_mmio + 0xC080;
+	}
+	priv->wr_name_idx = IDX_DISPLAYR;
+	priv->rd_name_idx = IDX_SWITCH;
+	filp->private_data = priv;
+
 	printk("my_driver: open was called\n");
 	return 0;
 }
 
 static int my_close(struct inode* inode, struct file* filp)
 {
+	kfree(filp->private_data);
 	printk("my_driver: close was called\n");
 	return 0;
 }
 
+static int event_pending(struct my_file* priv)
+{
+	return READ_ONCE(event_seq) != priv->seen_seq;
+}
+
+static ssize_t my_read_event(struct file* filp, char __user* buf, size_t count)
+{
+	struct my_file* priv = filp->private_data;
+	struct input_event_data event;
+	int to_cpy = 0;
+
+	/* block until the sampling timer reports a change, unless O_NONBLOCK */
+	while (!event_pending(priv)) {
+		if (filp->f_flags & O_NONBLOCK)
+			return -EAGAIN;
+		if (wait_event_interruptible(event_wq, event_pending(priv)))
+			return -ERESTARTSYS;
+	}
+
+	spin_lock_bh(&event_lock);
+	/* a reader that fell behind loses the oldest states, never the newest */
+	if (event_seq - priv->seen_seq > EVENT_QUEUE_LEN)
+		priv->seen_seq = event_seq - EVENT_QUEUE_LEN;
+	event = event_ring[priv->seen_seq & EVENT_QUEUE_MASK];
+	priv->seen_seq++;
+	spin_unlock_bh(&event_lock);
+
+	to_cpy = (count <= sizeof(event)) ? count : sizeof(event);
+	return to_cpy - copy_to_user(buf, &event, to_cpy);
+}
+
 static ssize_t my_read(struct file* filp, char __user* buf, size_t count, loff_t* f_pos)
 {
 	ssize_t retval = 0;
 	int to_cpy = 0;
-	static unsigned int temp_read = 0;
+	unsigned int temp_read = 0;
+	struct my_file* priv = filp->private_data;
+	void __iomem* read_pointer;
+	int rd_name_idx, events;
+
+	/* snapshot this file's selection */
+	mutex_lock(&priv->lock);
+	read_pointer = priv->read_pointer;
+	rd_name_idx = priv->rd_name_idx;
+	events = priv->events;
+	mutex_unlock(&priv->lock);
+
+	if (events)
+		return my_read_event(filp, buf, count);
 
 	/* check if the read_pointer pointer is set */
 	if (read_pointer == NULL) {
@@ -193,7 +303,7 @@ static ssize_t my_read(struct file* filp, char __user* buf, size_t count, loff_t
 
 	/* read from the device */
 	temp_read = ioread32(read_pointer);
-	printk("my_driver: red 0x%X from the %s\n", temp_read, peripheral[rd_name_idx]);
+	pr_debug("my_driver: red 0x%X from the %s\n", temp_read, peripheral[rd_name_idx]);
 
 	/* get amount of bytes to copy to user */
 	to_cpy = (count <= sizeof(temp_read)) ? count : sizeof(temp_read);
@@ -208,7 +318,16 @@ static ssize_t my_write(struct file* filp, const char __user* buf, size_t count,
 {
 	ssize_t retval = 0;
 	int to_cpy = 0;
-	static unsigned int temp_write = 0;
+	unsigned int temp_write = 0;
+	struct my_file* priv = filp->private_data;
+	void __iomem* write_pointer;
+	int wr_name_idx;
+
+	/* snapshot this file's selection */
+	mutex_lock(&priv->lock);
+	write_pointer = priv->write_pointer;
+	wr_name_idx = priv->wr_name_idx;
+	mutex_unlock(&priv->lock);
 
 	/* check if the write_pointer pointer is set */
 	if (write_pointer == NULL) {
@@ -224,44 +343,170 @@ static ssize_t my_write(struct file* filp, const char __user* buf, size_t count,
 
 	/* send to device */
 	iowrite32(temp_write, write_pointer);
-	printk("my_writer: wrote 0x%X to the %s\n", temp_write, peripheral[wr_name_idx]);
+	pr_debug("my_writer: wrote 0x%X to the %s\n", temp_write, peripheral[wr_name_idx]);
 
 	return retval;
 }
 
-static long int my_ioctl(struct file*, unsigned int cmd, unsigned long arg)
+static __poll_t my_poll(struct file* filp, struct poll_table_struct* wait)
 {
+	struct my_file* priv = filp->private_data;
+	__poll_t mask = POLLOUT | POLLWRNORM;
+
+	poll_wait(filp, &event_wq, wait);
+	if (priv->events && event_pending(priv))
+		mask |= POLLIN | POLLRDNORM;
+
+	return mask;
+}
+
+static void sample_inputs(struct timer_list* timer)
+{
+	struct input_event_data now, *last;
+
+	now.switches = ioread32(bar0_mmio + 0xC080);
+	now.buttons  = ioread32(bar0_mmio + 0xC140);
+
+	spin_lock(&event_lock);
+	last = &event_ring[(event_seq - 1) & EVENT_QUEUE_MASK];
+	if (now.switches != last->switches || now.buttons != last->buttons) {
+		event_ring[event_seq & EVENT_QUEUE_MASK] = now;
+		event_seq++;
+		spin_unlock(&event_lock);
+		wake_up_interruptible(&event_wq);
+	} else {
+		spin_unlock(&event_lock);
+	}
+
+	mod_timer(&sample_timer, jiffies + msecs_to_jiffies(sample_ms));
+}
+
+static void __iomem* read_register(unsigned int reg)
+{
+	switch (reg) {
+	case RD_SWITCHES: return bar0_mmio + 0xC080;
+	case RD_PBUTTONS: return bar0_mmio + 0xC140;
+	default:          return NULL;
+	}
+}
+
+static void __iomem* write_register(unsigned int reg)
+{
+	switch (reg) {
+	case WR_L_DISPLAY:  return bar0_mmio + 0xC160;
+	case WR_R_DISPLAY:  return bar0_mmio + 0xC040;
+	case WR_RED_LEDS:   return bar0_mmio + 0xC120;
+	case WR_GREEN_LEDS: return bar0_mmio + 0xC100;
+	default:            return NULL;
+	}
+}
+
+static long int my_batch(unsigned long arg)
+{
+	struct batch_transfer batch;
+	void __iomem* ptr;
+	unsigned int i;
+
+	if (bar0_mmio == NULL)
+		return -ENODEV;
+
+	/* a single copy in and a single copy out for the whole batch */
+	if (copy_from_user(&batch, (void __user*)arg, sizeof(batch)))
+		return -EFAULT;
+	if (batch.n_writes > BATCH_MAX || batch.n_reads > BATCH_MAX)
+		return -EINVAL;
+
+	for (i = 0; i < batch.n_writes; i++) {
+		if ((ptr = write_register(batch.writes[i].reg)) == NULL)
+			return -EINVAL;
+		iowrite32(batch.writes[i].value, ptr);
+	}
+
+	for (i = 0; i < batch.n_reads; i++) {
+		if ((ptr = read_register(batch.reads[i])) == NULL)
+			return -EINVAL;
+		batch.reads[i] = ioread32(ptr);
+	}
+
+	if (copy_to_user((void __user*)arg, &batch, sizeof(batch)))
+		return -EFAULT;
+
+	return 0;
+}
+
+static long int my_ioctl(struct file* filp, unsigned int cmd, unsigned long arg)
+{
+	struct my_file* priv = filp->private_data;
+
+	/* batches carry their own registers and touch no per file state */
+	if (cmd == RW_BATCH)
+		return my_batch(arg);
+
+	mutex_lock(&priv->lock);
+
+	/* selecting a register to read leaves the events mode */
+	if (cmd == RD_SWITCHES || cmd == RD_PBUTTONS)
+		priv->events = 0;
+
 	switch(cmd){
+	case RD_EVENTS:
+		/* the first read reports the current state right away */
+		priv->events = 1;
+		priv->seen_seq = READ_ONCE(event_seq) - 1;
+		break;
 	case RD_SWITCHES:
-		read_pointer = bar0_mmio + 0xC080;
-		rd_name_idx = IDX_SWITCH;
+		priv->read_pointer = bar0_mmio + 0xC080;
+		priv->rd_name_idx = IDX_SWITCH;
 		break;
 	case RD_PBUTTONS:
-		read_pointer = bar0_mmio + 0xC140;
-		rd_name_idx = IDX_PBUTTONS;
+		priv->read_pointer = bar0_mmio + 0xC140;
+		priv->rd_name_idx = IDX_PBUTTONS;
 		break;
 	case WR_L_DISPLAY:
-		write_pointer = bar0_mmio + 0xC160;
-		wr_name_idx = IDX_DISPLAYL;
+		priv->write_pointer = bar0_mmio + 0xC160;
+		priv->wr_name_idx = IDX_DISPLAYL;
 		break;
 	case WR_R_DISPLAY:
-		write_pointer = bar0_mmio + 0xC040;
-		wr_name_idx = IDX_DISPLAYR;
+		priv->write_pointer = bar0_mmio + 0xC040;
+		priv->wr_name_idx = IDX_DISPLAYR;
 		break;
 	case WR_RED_LEDS:
-		write_pointer = bar0_mmio + 0xC120;
-		wr_name_idx = IDX_DISPLAYR;
+		priv->write_pointer = bar0_mmio + 0xC120;
+		priv->wr_name_idx = IDX_REDLED;
 		break;
 	case WR_GREEN_LEDS:
-		write_pointer = bar0_mmio + 0xC100;
-		wr_name_idx = IDX_DISPLAYR;
+		priv->write_pointer = bar0_mmio + 0xC100;
+		priv->wr_name_idx = IDX_GREENLED;
 		break;
 	default:
 		printk("my_driver: unknown ioctl command: 0x%X\n", cmd);
 	}
+
+	mutex_unlock(&priv->lock);
 	return 0;
 }
 
+static int my_mmap(struct file* filp, struct vm_area_struct* vma)
+{
+	unsigned long size = vma->vm_end - vma->vm_start;
+
+	if (bar0_mmio == NULL) {
+		printk("my_driver: trying to mmap a device not probed yet\n");
+		return -ENODEV;
+	}
+
+	/* only the page holding the peripherals can be mapped */
+	if (vma->vm_pgoff != 0 || size > PERIPH_WINDOW_SIZE)
+		return -EINVAL;
+
+	/* registers must not be cached nor merged by the CPU */
+	vma->vm_page_prot = pgprot_noncached(vma->vm_page_prot);
+
+	return io_remap_pfn_range(vma, vma->vm_start,
+		(bar0_start + PERIPH_WINDOW_OFFSET) >> PAGE_SHIFT,
+		size, vma->vm_page_prot);
+}
+
 static int __init my_pci_probe(struct pci_dev *dev, const struct pci_device_id *id)
 {
 	unsigned short vendor, device;
@@ -296,18 +541,21 @@ static int __init my_pci_probe(struct pci_dev *dev, const struct pci_device_id *
 
 	/* map the BAR0 Physical address space to virtual space */
 	bar0_mmio = pci_iomap(dev, 0, bar_len);
+	bar0_start = pci_resource_start(dev, 0);
 
-	/* initialize a default peripheral read and write pointer */
-	write_pointer = bar0_mmio + 0xC040;
-	read_pointer  = bar0_mmio + 0xC080;
+	/* start sampling the inputs for change events */
+	event_ring[0].switches = ioread32(bar0_mmio + 0xC080);
+	event_ring[0].buttons  = ioread32(bar0_mmio + 0xC140);
+	event_seq = 1;
+	timer_setup(&sample_timer, sample_inputs, 0);
+	mod_timer(&sample_timer, jiffies + msecs_to_jiffies(sample_ms));
 
 	return 0;
 }
 
 static void __exit my_pci_remove(struct pci_dev *dev)
 {
-	read_pointer = NULL;
-	write_pointer = NULL;
+	del_timer_sync(&sample_timer);
 
 	/* remove the IO mapping done in probe func */
 	pci_iounmap(dev, bar0_mmio);
@@ -7,5 +7,23 @@
 #define WR_R_DISPLAY  _IO('a', 'd')
 #define WR_RED_LEDS   _IO('a', 'e')
 #define WR_GREEN_LEDS _IO('a', 'f')
+#define RD_EVENTS     _IO('a', 'g')
+
+/* batched register transfer: all writes, then all reads, in one ioctl */
+#define BATCH_MAX 8
+
+struct batch_write {
+	unsigned int reg;	/* WR_* command selecting the register */
+	unsigned int value;
+};
+
+struct batch_transfer {
+	unsigned int n_writes;
+	unsigned int n_reads;
+	struct batch_write writes[BATCH_MAX];
+	unsigned int reads[BATCH_MAX];	/* RD_* commands in, register values out */
+};
+
+#define RW_BATCH      _IOWR('a', 'h', struct batch_transfer)
 
 #endif /* __IOCTL_CMDS_H__ */